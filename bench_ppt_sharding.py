@@ -0,0 +1,110 @@
+"""
+PPT 分片基准：生成多页演示文稿，分别以单进程和多进程分片模式翻译，
+比较耗时并逐个部件对比两种模式的输出是否完全一致。
+使用假翻译核心，不访问 LLM 服务。
+用法：python bench_ppt_sharding.py [幻灯片数] [进程数]
+一致性检查也可以用 pytest 运行：python -m pytest bench_ppt_sharding.py
+"""
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from lxml import etree
+from pptx import Presentation
+from pptx.util import Inches, Pt
+import ppt_translator
+
+
+class FakeTranslationCore:
+    """假翻译核心：译文为原文重复两次并加括号，长度变化足以触发字号调整"""
+    def translate_unique(self, texts, source_lang, target_lang, progress_callback=None, fallback_on_error=False):
+        unique_texts = list(dict.fromkeys(text for text in texts if text and text.strip()))
+        if progress_callback:
+            progress_callback(len(unique_texts), len(unique_texts))
+        return {text: f"【{text} {text}】" for text in unique_texts}
+
+
+def build_deck(path, slide_count):
+    """生成包含标题占位符、文本框、表格和多格式 run 的演示文稿"""
+    prs = Presentation()
+    for i in range(slide_count):
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.title.text = f"Slide {i} overview"
+        text_frame = slide.shapes.add_textbox(Inches(1), Inches(2), Inches(4), Inches(1.5)).text_frame
+        text_frame.word_wrap = True
+        for j in range(4):
+            paragraph = text_frame.paragraphs[0] if j == 0 else text_frame.add_paragraph()
+            for k, bold in enumerate((False, True)):
+                run = paragraph.add_run()
+                run.text = f"Bullet {j} of slide {i}, part {k}. "
+                run.font.bold = bold
+                run.font.size = Pt(18)
+        table = slide.shapes.add_table(2, 2, Inches(5.5), Inches(2), Inches(3), Inches(1)).table
+        for r in range(2):
+            for c in range(2):
+                table.cell(r, c).text = f"Cell {r}{c} on slide {i}"
+    prs.save(path)
+
+
+def translate(path, output_path, workers):
+    ppt_translator.PPT_SHARD_WORKERS = workers
+    ppt_translator.PPT_SHARD_MIN_SLIDES = 1
+    start = time.perf_counter()
+    ppt_translator.translate_powerpoint(FakeTranslationCore(), path, output_path, "English", "Chinese", None)
+    return time.perf_counter() - start
+
+
+def canonical(name, data):
+    """XML 部件转换为规范形式（C14N），空元素 <a:t/> 与 <a:t></a:t> 视为相同"""
+    if name.endswith(('.xml', '.rels')):
+        return etree.tostring(etree.fromstring(data), method='c14n')
+    return data
+
+
+def diff_parts(path_a, path_b):
+    """逐个部件比较两个 pptx 文件，返回内容不同的部件名"""
+    with zipfile.ZipFile(path_a) as zip_a, zipfile.ZipFile(path_b) as zip_b:
+        names_a, names_b = set(zip_a.namelist()), set(zip_b.namelist())
+        return [name for name in sorted(names_a | names_b)
+                if name not in names_a or name not in names_b
+                or canonical(name, zip_a.read(name)) != canonical(name, zip_b.read(name))]
+
+
+def compare(slide_count, workers):
+    """
+    分别以单进程和分片模式翻译同一份演示文稿
+    :return: (单进程耗时, 分片耗时, 内容不同的部件名, 分片输出中的幻灯片文本)
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, "deck.pptx")
+        serial_output = os.path.join(temp_dir, "serial.pptx")
+        sharded_output = os.path.join(temp_dir, "sharded.pptx")
+        build_deck(source, slide_count)
+        serial_seconds = translate(source, serial_output, 0)
+        sharded_seconds = translate(source, sharded_output, workers)
+        different = diff_parts(serial_output, sharded_output)
+        texts = [shape.text_frame.text for slide in Presentation(sharded_output).slides
+                 for shape in slide.shapes if shape.has_text_frame]
+    return serial_seconds, sharded_seconds, different, texts
+
+
+def test_sharded_output_matches_serial():
+    """分片模式的输出与单进程模式逐部件一致，且译文确实写回了幻灯片"""
+    _, _, different, texts = compare(slide_count=8, workers=2)
+    assert different == [], f"分片输出与单进程输出不一致: {different}"
+    assert texts and all(text.startswith("【") for text in texts)
+
+
+def main(slide_count=300, workers=4):
+    serial_seconds, sharded_seconds, different, _ = compare(slide_count, workers)
+    print(f"{slide_count} slides (fake translation core)")
+    print(f"  serial           : {serial_seconds:6.2f}s")
+    print(f"  sharded ({workers} procs): {sharded_seconds:6.2f}s")
+    assert not different, f"OUTPUT MISMATCH in {len(different)} parts: {', '.join(different[:10])}"
+    print("  outputs identical")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 4)
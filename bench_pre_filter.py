@@ -0,0 +1,66 @@
+"""
+前置检查微基准：对比旧实现（逐段编译正则 + langdetect）与 pre_filter 的单段耗时。
+用法：python bench_pre_filter.py [重复次数]
+"""
+import re
+import sys
+import timeit
+from langdetect import detect_langs
+from translation_core import AcronymManager
+from pre_filter import PreTranslationFilter
+
+SAMPLES = [
+    "Signal name", "Default value", "ECU", "0x1A2B", "CAN_TX_ID_01", "12.5 V",
+    "车速信号无效", "默认值", "ブレーキ制御", "Brake pedal position sensor fault",
+    "DTC U0100: Lost communication with ECM/PCM", "Set the 速度 limit", "↑↓", "A",
+]
+LANG_CODE_MAP = {'Chinese': 'zh', 'Japanese': 'ja', 'English': 'en'}
+
+
+def legacy_check(acronym_manager, text, target_lang):
+    """旧版 TranslationCore._pre_translation_checks 的等价实现（用于对比）"""
+    if not text or text.strip() == "":
+        return text
+    stripped_text = text.strip()
+    if stripped_text.upper() in acronym_manager.industry_abbreviations:
+        return text
+    if not any(c.islower() for c in stripped_text):
+        pattern = rf'^[{acronym_manager.alphanumeric_chars}{acronym_manager.special_characters}]*$'
+        if re.match(pattern, stripped_text, re.ASCII) is not None:
+            return text
+    try:
+        try:
+            lang_score = {lang.lang: lang.prob for lang in detect_langs(text)}
+        except Exception:
+            lang_score = {'unknown': 0.0}
+        target_code = LANG_CODE_MAP[target_lang]
+        if lang_score[target_code] > 0.6:
+            return text
+        if target_code == 'zh' and re.search(r'[\u4e00-\u9fff]', text):
+            return text
+        if target_code == 'ja' and re.search(r'[\u3040-\u309f\u30a0-\u30ff\u4e00-\u9faf]', text):
+            return text
+    except Exception:
+        pass
+    if len(text.strip()) <= 1 and not text.isdigit():
+        return text
+    return None
+
+
+def main(repeat=200):
+    acronym_manager = AcronymManager()
+    pre_filter = PreTranslationFilter(acronym_manager)
+    segments = SAMPLES * repeat
+    for target_lang in ('Chinese', 'English'):
+        legacy = timeit.timeit(lambda: [legacy_check(acronym_manager, t, target_lang) for t in segments], number=1)
+        single = timeit.timeit(lambda: [pre_filter.classify(t, target_lang) for t in segments], number=1)
+        batch = timeit.timeit(lambda: pre_filter.classify_batch(segments, target_lang), number=1)
+        n = len(segments)
+        print(f"[{target_lang}] {n} segments")
+        print(f"  legacy (langdetect)   : {legacy / n * 1e6:9.1f} us/segment")
+        print(f"  pre_filter.classify   : {single / n * 1e6:9.1f} us/segment ({legacy / single:.0f}x)")
+        print(f"  pre_filter.batch      : {batch / n * 1e6:9.1f} us/segment ({legacy / batch:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,88 @@
+"""
+进度事件检查：用 eager 模式的 Celery 任务驱动 TranslationCore.translate_unique，
+进度回调在翻译引擎的事件循环线程中执行（该线程上 task.request.id 为 None），
+确认每条 PROGRESS 事件和结果后端记录都使用真实任务 ID。
+使用假模型回复和进程内事件中心，不访问 LLM 服务和 Redis。
+用法：python bench_progress_events.py [片段数]
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+import warnings
+from celery import Celery
+import task_events
+from progress_reporter import ProgressReporter
+from translation_core import TranslationCore
+
+TASK_ID = 'bench-progress-events'
+
+task_events.TASK_EVENTS_BACKEND = 'local'
+app = Celery('bench_progress_events', broker='memory://', backend='cache+memory://')
+app.conf.task_always_eager = True
+
+translation_core = None
+callback_threads = set()
+
+
+def make_core(delay=0.01):
+    """真实的 TranslationCore，只把批量请求替换为假回复（译文加括号）"""
+    core = TranslationCore()
+    core.cache = None
+    core.checkpoints = None
+
+    async def fake_batch(segments, source_lang, target_lang):
+        await asyncio.sleep(delay)
+        return json.dumps({seg_id: f"[{text}]" for seg_id, text in segments.items()}, ensure_ascii=False)
+
+    core.abatch_translation_with_lang = fake_batch
+    return core
+
+
+@app.task(bind=True)
+def translate_job(self, texts):
+    reporter = ProgressReporter(self, min_interval_ms=0)
+
+    def on_progress(current, total):
+        callback_threads.add(threading.current_thread().name)
+        reporter(current, total)
+
+    translation_core.translate_unique(texts, "English", "Chinese", progress_callback=on_progress)
+    reporter.flush()
+    return reporter.emitted
+
+
+def main():
+    global translation_core
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    texts = [f"Check the brake pedal sensor number {i} before driving." for i in range(count)]
+    translation_core = make_core()
+
+    hub = task_events.get_event_hub()
+    subscriber = hub.subscribe(TASK_ID)
+    start = time.perf_counter()
+    emitted = translate_job.apply(args=(texts,), task_id=TASK_ID).get()
+    elapsed = time.perf_counter() - start
+    hub.unsubscribe(TASK_ID, subscriber)
+
+    events = []
+    while not subscriber.empty():
+        events.append(subscriber.get())
+    print(f"{count} 个片段，耗时 {elapsed:.2f}s，回调线程 {sorted(callback_threads)}，"
+          f"上报 {emitted} 次，收到事件 {len(events)} 条")
+
+    assert "translation-engine" in callback_threads, "进度回调没有经过翻译引擎线程"
+    assert len(events) == emitted and emitted > 1, "事件频道没有收到全部进度事件"
+    assert events[-1]['current'] == events[-1]['total'] == count
+    # 结果后端：进度写在真实任务 ID 下，而不是 celery-task-meta-None
+    # （eager 模式读取结果后端会发出 RuntimeWarning，这里只读取 update_state 写入的记录）
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        assert app.backend.get_task_meta(TASK_ID)['status'] == 'PROGRESS'
+        assert app.backend.get_task_meta('None')['status'] == 'PENDING'
+    print("OK: 所有进度事件和结果后端记录都使用真实任务 ID")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+prompt 链基准：对比每个片段重新构建 prompt/LCEL 链（旧实现）与从注册表复用预编译链的 Python 侧开销。
+使用假模型，不访问 LLM 服务。
+用法：python bench_prompt_chains.py [片段数]
+"""
+import sys
+import time
+from langchain_core.language_models import FakeListChatModel
+from langchain.schema import StrOutputParser
+from prompt_registry import PromptChainRegistry, build_prompt, INITIAL
+
+
+def run_rebuild(llm, texts):
+    """旧实现：每个片段都重新构建 prompt 模板和链"""
+    for text in texts:
+        chain = build_prompt(INITIAL, "English", "Chinese") | llm | StrOutputParser()
+        chain.invoke({"input": text})
+
+
+def run_registry(llm, texts):
+    """新实现：从注册表获取预编译链"""
+    registry = PromptChainRegistry(llm)
+    for text in texts:
+        registry.get(INITIAL, "English", "Chinese").invoke({"input": text})
+
+
+def run_build_only(llm, texts):
+    """只构建链，不调用（旧实现中纯粹的重复构建成本）"""
+    for _ in texts:
+        build_prompt(INITIAL, "English", "Chinese") | llm | StrOutputParser()
+
+
+def main(count=2000):
+    llm = FakeListChatModel(responses=["译文"])
+    texts = [f"Signal name {i}" for i in range(count)]
+    timings = {}
+    for name, func in (("rebuild per segment", run_rebuild), ("registry", run_registry), ("chain build only", run_build_only)):
+        start = time.perf_counter()
+        func(llm, texts)
+        timings[name] = time.perf_counter() - start
+    print(f"{count} segments (fake LLM, Python-side overhead only)")
+    for name, seconds in timings.items():
+        print(f"  {name:20s}: {seconds / count * 1e6:8.1f} us/segment")
+    saved = timings["rebuild per segment"] - timings["registry"]
+    print(f"  removed overhead    : {saved / count * 1e6:8.1f} us/segment ({saved:.2f}s per {count} segments)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
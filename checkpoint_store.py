@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from gl_config import LOG_LEVEL, CHECKPOINT_DB_PATH, CHECKPOINT_LEASE_SECONDS
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+# 任务状态
+JOB_RUNNING = 'running'
+JOB_FAILED = 'failed'
+JOB_DONE = 'done'
+
+
+class CheckpointStore:
+    """
+    翻译任务检查点（SQLite，本地持久化）。
+    - 每个片段翻译完成后按 (任务ID, 片段ID) 保存译文，worker 崩溃或模型服务重启后，
+      重试或重新提交的同一任务只翻译尚未完成的片段
+    - jobs 表记录任务参数，供 /resume 接口重新提交；任务成功后删除该任务的片段检查点
+    - 运行中的任务由 worker 定期续租（lease_expires_at），租约过期说明执行它的 worker 已经退出
+    """
+    def __init__(self, db_path=CHECKPOINT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " file_path TEXT, output_path TEXT,"
+            " source_lang TEXT, target_lang TEXT,"
+            " status TEXT,"
+            " recovered INTEGER DEFAULT 0,"
+            " created_at TEXT, updated_at TEXT,"
+            " lease_expires_at REAL)"
+        )
+        # 旧版本创建的 jobs 表没有租约列
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if 'lease_expires_at' not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_expires_at REAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " job_id TEXT NOT NULL,"
+            " segment_id TEXT NOT NULL,"
+            " translated_text TEXT,"
+            " PRIMARY KEY (job_id, segment_id)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def segment_id(text, source_lang, target_lang):
+        """片段ID：语言对和原文的哈希"""
+        return hashlib.sha256(f"{source_lang}\x1f{target_lang}\x1f{text}".encode('utf-8')).hexdigest()
+
+    def register_job(self, job_id, file_path, output_path, source_lang, target_lang):
+        """登记（或重新开始）一个任务并取得租约，已有的片段检查点保留"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        lease_expires_at = time.time() + CHECKPOINT_LEASE_SECONDS
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, file_path, output_path, source_lang, target_lang, status, recovered,"
+                " created_at, updated_at, lease_expires_at) VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?)"
+                " ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, recovered = 0,"
+                " updated_at = excluded.updated_at, lease_expires_at = excluded.lease_expires_at",
+                (job_id, file_path, output_path, source_lang, target_lang, JOB_RUNNING, now, now, lease_expires_at)
+            )
+            self._conn.commit()
+
+    def renew_lease(self, job_id, seconds=CHECKPOINT_LEASE_SECONDS):
+        """续租运行中的任务：租约延长到至少 seconds 秒之后（不会缩短已有的更长租约）"""
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE jobs SET lease_expires_at = MAX(COALESCE(lease_expires_at, 0), ?)"
+                    " WHERE job_id = ? AND status = ?",
+                    (time.time() + seconds, job_id, JOB_RUNNING)
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"续租任务检查点失败: {e}")
+
+    def claim_for_resume(self, job_id):
+        """
+        原子地认领一个可恢复的任务：任务已失败，或仍为运行中但租约已过期（执行它的 worker 已退出）。
+        认领成功时任务重新进入运行中并取得新租约，并发的第二次认领会失败
+        :return: 是否认领成功
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, lease_expires_at = ?, updated_at = ?"
+                " WHERE job_id = ? AND (status = ? OR (status = ? AND COALESCE(lease_expires_at, 0) < ?))",
+                (JOB_RUNNING, now + CHECKPOINT_LEASE_SECONDS, datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                 job_id, JOB_FAILED, JOB_RUNNING, now)
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def get_job(self, job_id):
+        """返回任务信息（含已保存的片段数），不存在时返回 None"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT job_id, file_path, output_path, source_lang, target_lang, status, recovered,"
+                " created_at, updated_at, lease_expires_at FROM jobs WHERE job_id = ?", (job_id,)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            job = dict(zip([column[0] for column in cursor.description], row))
+            job['checkpointed'] = self._conn.execute(
+                "SELECT COUNT(*) FROM segments WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+        return job
+
+    def set_status(self, job_id, status):
+        """更新任务状态；任务结束时释放租约，任务完成时删除其片段检查点"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        lease_expires_at = time.time() + CHECKPOINT_LEASE_SECONDS if status == JOB_RUNNING else None
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, lease_expires_at = ? WHERE job_id = ?",
+                (status, now, lease_expires_at, job_id)
+            )
+            if status == JOB_DONE:
+                self._conn.execute("DELETE FROM segments WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+
+    def load(self, job_id, segment_ids):
+        """
+        批量读取已保存的译文
+        :return: {片段ID: 译文}
+        """
+        found = {}
+        segment_ids = list(segment_ids)
+        with self._lock:
+            for start in range(0, len(segment_ids), 500):  # SQLite 参数个数上限
+                chunk = segment_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(self._conn.execute(
+                    f"SELECT segment_id, translated_text FROM segments WHERE job_id = ? AND segment_id IN ({placeholders})",
+                    [job_id] + chunk
+                ).fetchall())
+        return found
+
+    def save(self, job_id, items):
+        """
+        保存一批已完成片段的译文（立即提交）
+        :param items: [(片段ID, 译文)]
+        """
+        if not items:
+            return
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO segments (job_id, segment_id, translated_text) VALUES (?, ?, ?)",
+                    [(job_id, segment_id, text) for segment_id, text in items]
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"写入翻译检查点失败: {e}")
+
+    def add_recovered(self, job_id, count):
+        """累加本次运行从检查点恢复的片段数"""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET recovered = recovered + ? WHERE job_id = ?", (count, job_id))
+            self._conn.commit()
+
+
+_checkpoint_store = None
+_checkpoint_store_lock = threading.Lock()
+
+def get_checkpoint_store():
+    """获取当前进程的 CheckpointStore 单例"""
+    global _checkpoint_store
+    if _checkpoint_store is None:
+        with _checkpoint_store_lock:
+            if _checkpoint_store is None:
+                _checkpoint_store = CheckpointStore()
+    return _checkpoint_store
@@ -0,0 +1,86 @@
+import logging
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from gl_config import LOG_LEVEL, EXCEL_PASSTHROUGH_RATIO, EXCEL_PROFILE_MIN_CELLS, EXCEL_COLUMN_OVERRIDES
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+# 列分类结果
+TRANSLATE = 'translate'
+PASSTHROUGH = 'passthrough'
+
+# 常见单位：V/A/W/Hz/s/km/h/rpm/°C/%/Nm/bar/Pa/mm/kg/dB/Ω/bit/byte 等
+_UNITS = (
+    r'(?:[mk\u00b5u]?V|m?A|k?W|[kM]?Hz|[m\u00b5u]?s|min|h|km/h|m/s\u00b2?|rpm|\u00b0C|\u2103|%|N\.?m|N|bar|k?Pa'
+    r'|[mck]?m|kg|g|[lL]|dB|k?\u03a9|bits?|bytes?|[KM]?B)'
+)
+
+# 非语言内容的整格模式：十六进制、信号名/标识符、零件号、数值（可带单位）、单位
+_PASSTHROUGH_PATTERN = '|'.join([
+    r'0[xX][0-9A-Fa-f]+',                                 # 0x1F
+    r'[0-9][0-9A-Fa-f]*[hH]',                             # 1Fh
+    r'[A-Za-z][A-Za-z0-9]*(?:[_.][A-Za-z0-9]+)+',         # VehSpd_Kph, CAN.Msg.Id
+    r'[A-Za-z]+[A-Z0-9][A-Za-z0-9]*',                     # VehicleSpeed, ABS, ECU2
+    r'[A-Z0-9]+(?:[-/][A-Z0-9]+)+',                       # 12345-ABC-01
+    rf'[-+]?\d+(?:[.,]\d+)*\s*{_UNITS}?',                 # 42, 3.5 V, 100 km/h
+    _UNITS,                                               # km/h
+])
+
+# 不持有单元格对象时的轻量单元格记录（流式模式、共享字符串模式），source 为调用方附带的数据
+CellValue = namedtuple('CellValue', ['column_letter', 'value', 'source'], defaults=[None])
+
+
+class ColumnProfiler:
+    """
+    Excel 列画像：按列统计非语言内容的占比，整列判定为需要翻译或直接跳过。
+    匹配在 pandas 中向量化完成，跳过列中匹配模式的单元格不会进入逐段翻译流程；
+    跳过列中的表头等自然语言单元格仍然正常翻译。
+    """
+    def __init__(self, passthrough_ratio=EXCEL_PASSTHROUGH_RATIO, min_cells=EXCEL_PROFILE_MIN_CELLS,
+                 overrides=EXCEL_COLUMN_OVERRIDES):
+        self.passthrough_ratio = passthrough_ratio
+        self.min_cells = min_cells
+        self.overrides = overrides or {}
+
+    def profile(self, sheet_name, cells):
+        """
+        对一个工作表的文本单元格做列画像
+        :param cells: 工作表中的文本单元格列表（openpyxl 单元格或 CellValue）
+        :return: (需要翻译的单元格列表, 跳过的单元格数, 跳过的列字母列表)
+        """
+        if not cells:
+            return cells, 0, []
+        frame = pd.DataFrame({
+            'column': [cell.column_letter for cell in cells],
+            'value': pd.Series([cell.value for cell in cells], dtype=object).str.strip(),
+        })
+        frame['code'] = frame['value'].str.fullmatch(_PASSTHROUGH_PATTERN)
+
+        stats = frame.groupby('column')['code'].agg(['mean', 'size'])
+        modes = pd.Series(
+            np.where((stats['mean'] >= self.passthrough_ratio) & (stats['size'] >= self.min_cells),
+                     PASSTHROUGH, TRANSLATE),
+            index=stats.index
+        )
+        for column in modes.index:
+            override = self.overrides.get(f'{sheet_name}!{column}', self.overrides.get(column))
+            if override in (TRANSLATE, PASSTHROUGH):
+                modes[column] = override
+
+        passthrough_columns = modes.index[modes == PASSTHROUGH]
+        # 自动判定的跳过列只跳过匹配模式的单元格，手动指定的跳过列整列跳过
+        forced = [column for column in passthrough_columns
+                  if self.overrides.get(f'{sheet_name}!{column}', self.overrides.get(column)) == PASSTHROUGH]
+        skip = np.logical_and(
+            frame['column'].isin(passthrough_columns).to_numpy(),
+            frame['code'].to_numpy(dtype=bool) | frame['column'].isin(forced).to_numpy()
+        )
+
+        kept_cells = [cell for cell, skipped in zip(cells, skip) if not skipped]
+        skipped_count = int(skip.sum())
+        if skipped_count:
+            logging.info(f"Sheet '{sheet_name}': skipped {skipped_count} cells in passthrough columns "
+                         f"{', '.join(passthrough_columns)}")
+        return kept_cells, skipped_count, list(passthrough_columns)
@@ -0,0 +1,141 @@
+import logging
+import shutil
+import zipfile
+from lxml import etree
+from gl_config import LOG_LEVEL, WORD_TRANSLATION_MODE
+from ppt_translator import split_text, split_text_into_parts, translate_paragraph_text
+from progress_reporter import ProgressReporter
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+NS_W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+NS_CONTENT_TYPES = 'http://schemas.openxmlformats.org/package/2006/content-types'
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+W_P = f'{{{NS_W}}}p'
+W_T = f'{{{NS_W}}}t'
+
+# 块级容器：流式处理时只保留这些元素的起止标签，其子元素逐个处理后立即写出并释放
+CONTAINER_TAGS = {f'{{{NS_W}}}{name}' for name in (
+    'document', 'body', 'hdr', 'ftr', 'tbl', 'tr', 'tc', 'sdt', 'sdtContent', 'customXml'
+)}
+
+# 需要翻译的部件：正文、页眉、页脚
+TRANSLATED_CONTENT_TYPE_SUFFIXES = ('document.main+xml', 'template.main+xml', '.header+xml', '.footer+xml')
+
+
+def _translated_parts(zin):
+    """从 [Content_Types].xml 中找出正文、页眉、页脚部件"""
+    root = etree.fromstring(zin.read('[Content_Types].xml'))
+    return [override.get('PartName').lstrip('/')
+            for override in root.iter(f'{{{NS_CONTENT_TYPES}}}Override')
+            if override.get('ContentType', '').endswith(TRANSLATED_CONTENT_TYPE_SUFFIXES)]
+
+def _stream_part(source, handle_block, xf=None):
+    """
+    增量解析一个 WordprocessingML 部件。
+    块级容器（body/tbl/tr/tc 等）只记录起止标签，容器的直接子元素（段落、sectPr 等）
+    解析完成后交给 handle_block 处理，随即从树中移除（xf 不为空时写出），
+    因此内存占用与单个段落成正比，而不是整个文档。
+    """
+    containers = []  # [(元素, xmlfile 上下文)]
+    for event, elem in etree.iterparse(source, events=('start', 'end'), huge_tree=True):
+        if event == 'start':
+            if not containers or (elem.tag in CONTAINER_TAGS and elem.getparent() is containers[-1][0]):
+                context = None
+                if xf is not None:
+                    # 根元素声明全部命名空间（mc:Ignorable 引用的前缀必须在根上声明）
+                    context = xf.element(elem.tag, dict(elem.attrib), nsmap=elem.nsmap if not containers else None)
+                    context.__enter__()
+                containers.append((elem, context))
+        elif elem is containers[-1][0]:
+            _, context = containers.pop()
+            if context is not None:
+                context.__exit__(None, None, None)
+        elif elem.getparent() is containers[-1][0]:
+            handle_block(elem)
+            elem.getparent().remove(elem)
+            if xf is not None:
+                xf.write(elem)
+
+def _paragraph_units(block):
+    """
+    返回块中每个段落的翻译单元 [(w:t 元素列表, 合并文本)]。
+    文本框中的嵌套段落单独作为一个单元。
+    """
+    units = []
+    for paragraph in block.iter(W_P):
+        t_elements = [t for t in paragraph.iter(W_T) if next(t.iterancestors(W_P)) is paragraph]
+        if WORD_TRANSLATION_MODE == 'paragraph':
+            units.append((t_elements, "".join(t.text or "" for t in t_elements)))
+        else:
+            units.extend(([t], t.text or "") for t in t_elements)
+    return [(t_elements, text) for t_elements, text in units if text.strip()]
+
+def _set_text(t_element, text):
+    t_element.text = text
+    if text != text.strip():
+        t_element.set(XML_SPACE, 'preserve')
+
+def _apply_unit(t_elements, combined_text, translations, target_lang):
+    """把译文写回 w:t 元素，多个元素时按原数量拆分"""
+    translated_text = translate_paragraph_text(combined_text, translations)
+    if translated_text == combined_text:
+        return
+    if len(t_elements) == 1:
+        _set_text(t_elements[0], translated_text)
+        return
+    for t_element, part in zip(t_elements, split_text_into_parts(translated_text, len(t_elements), target_lang)):
+        _set_text(t_element, part)
+
+def _copy_zip_info(info):
+    zip_info = zipfile.ZipInfo(info.filename, info.date_time)
+    zip_info.compress_type = zipfile.ZIP_DEFLATED
+    zip_info.external_attr = info.external_attr
+    return zip_info
+
+def translate_word_streaming(translation_core, file_path, output_path, source_lang, target_lang, task):
+    """
+    流式翻译超大 Word 文档：不构建 python-docx 对象树，直接增量解析 word/document.xml 和页眉页脚部件。
+    第一遍只收集去重后的段落文本，第二遍边解析边把译文写入输出压缩包，其余部件原样复制。
+    """
+    logging.info(f"Using streaming mode for large Word file: {file_path}")
+    with zipfile.ZipFile(file_path) as zin:
+        part_names = _translated_parts(zin)
+
+        # 1. 收集阶段：只保留去重后的文本分块
+        unique_chunks = {}
+
+        def collect_block(block):
+            for _, text in _paragraph_units(block):
+                for chunk in split_text(text):
+                    unique_chunks[chunk] = None
+
+        for part_name in part_names:
+            with zin.open(part_name) as source:
+                _stream_part(source, collect_block)
+
+        # 2. 翻译阶段
+        reporter = ProgressReporter(task)
+        translations = translation_core.translate_unique(
+            list(unique_chunks), source_lang, target_lang, progress_callback=reporter
+        )
+        reporter.flush()
+        unique_chunks.clear()
+
+        # 3. 回写阶段：翻译部件边解析边写出，其余部件原样复制
+        def translate_block(block):
+            for t_elements, text in _paragraph_units(block):
+                _apply_unit(t_elements, text, translations, target_lang)
+
+        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                with zin.open(info) as source, zout.open(_copy_zip_info(info), 'w') as target:
+                    if info.filename in part_names:
+                        with etree.xmlfile(target, encoding='UTF-8') as xf:
+                            xf.write_declaration(standalone=True)
+                            _stream_part(source, translate_block, xf)
+                    else:
+                        shutil.copyfileobj(source, target)
+    logging.info(f"Completed streaming translation ({len(part_names)} parts). Saved to: {output_path}")
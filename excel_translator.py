@@ -1,9 +1,16 @@
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from openpyxl import load_workbook, Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, Fill, Border, Alignment
 from openpyxl.drawing.image import Image
-from gl_config import LOG_LEVEL
+from gl_config import LOG_LEVEL, EXCEL_STREAMING_THRESHOLD_BYTES, EXCEL_ENGINE, EXCEL_SHEET_WORKERS, EXCEL_COLUMN_PROFILING
+from progress_reporter import ProgressReporter
+from xlsx_sst_translator import translate_xlsx_shared_strings
+from column_profiler import ColumnProfiler, CellValue
 
 
 logging.basicConfig(level=LOG_LEVEL)
@@ -11,6 +18,14 @@ logging.basicConfig(level=LOG_LEVEL)
 def translate_excel(translation_core, file_path, output_path, source_lang, target_lang, task):
     """翻译Excel文件并保持原始格式和结构"""
     logging.info(f"Starting translation of Excel file: {file_path}")
+
+    # 共享字符串引擎：直接改写 xlsx 包内的字符串表，保留形状、图表和公式
+    if EXCEL_ENGINE == 'sharedstrings' and file_path.lower().endswith('.xlsx'):
+        return translate_xlsx_shared_strings(translation_core, file_path, output_path, source_lang, target_lang, task)
+
+    # 超大工作簿使用流式模式，峰值内存与行数无关
+    if EXCEL_STREAMING_THRESHOLD_BYTES and os.path.getsize(file_path) >= EXCEL_STREAMING_THRESHOLD_BYTES:
+        return translate_excel_streaming(translation_core, file_path, output_path, source_lang, target_lang, task)
     
     # 加载原始工作簿和创建翻译后的工作簿
     excel_wb = load_workbook(file_path, data_only=True)
@@ -18,58 +33,180 @@ def translate_excel(translation_core, file_path, output_path, source_lang, targe
     total_sheets = len(excel_wb.sheetnames)
 
     # TODO openpyxl 无法读取形状 保存后会丢失
-    
-    for sheet_idx, sheet_name in enumerate(excel_wb.sheetnames, 1):
-        # 获取原始Sheet并创建对应的翻译Sheet
-        original_sheet = excel_wb[sheet_name]       
-        
-        # 计算当前Sheet的总单元格数
-        total_cells = original_sheet.max_row * original_sheet.max_column
-        
-        # 翻译单元格内容并复制格式
-        for row_idx, row in enumerate(original_sheet.iter_rows(), 1):
-            for cell_idx, cell in enumerate(row, 1):
-                if cell.value is not None and isinstance(cell.value, str) and cell.value.strip():  # 检查单元格内容是否为空白字符串
-                    translated_value = _translate_cell_value(cell, translation_core, source_lang, target_lang)
-                    cell.value = translated_value
-                    
-                    # 更新单元格翻译进度
-                    cell_progress = ((row_idx - 1) * original_sheet.max_column + cell_idx) / total_cells * 100
-                    if task is not None:
-                        task.update_state(
-                            state='PROGRESS',
-                            meta={
-                                'current': sheet_idx,
-                                'total': total_sheets,
-                                'cell_progress': cell_progress,
-                                'sheet_progress': (sheet_idx - 1) / total_sheets * 100,
-                                'progress': ((sheet_idx - 1) + cell_progress / 100) / total_sheets * 100
-                            }
-                        )
-        
-        # 更新任务进度
-        sheet_progress = (sheet_idx / total_sheets) * 100
-        if task is not None:
-            task.update_state(
-                state='PROGRESS',
-                meta={
-                    'current': sheet_idx,
-                    'total': total_sheets,
-                    'cell_progress': 100,
-                    'sheet_progress': sheet_progress,
-                    'progress': sheet_progress
-                }
-            )
-        logging.info(f"Progress: {sheet_progress:.1f}% - Translated sheet '{sheet_name}'")
+
+    # 1. 收集阶段：按工作表收集需要翻译的单元格
+    sheet_cells = _collect_text_cells(excel_wb)
+
+    # 列画像：跳过十六进制、信号名、零件号、单位等非语言列
+    skipped_cells = 0
+    if EXCEL_COLUMN_PROFILING:
+        profiler = ColumnProfiler()
+        for sheet_name, cells in sheet_cells.items():
+            sheet_cells[sheet_name], skipped, _ = profiler.profile(sheet_name, cells)
+            skipped_cells += skipped
+
+    # 2. 翻译阶段：各工作表并发翻译，每个唯一文本只由第一个出现它的工作表负责
+    reporter = ProgressReporter(task)
+    translations = _translate_sheets(translation_core, sheet_cells, source_lang, target_lang, reporter,
+                                     skipped_cells=skipped_cells)
+    reporter.flush()
+
+    # 3. 回写阶段：在主线程把译文写回每一个出现该文本的单元格，最后统一保存
+    text_cell_count = 0
+    for cells in sheet_cells.values():
+        for cell in cells:
+            cell.value = translations.get(cell.value, cell.value)
+        text_cell_count += len(cells)
+    logging.info(f"Translated {text_cell_count} cells ({len(translations)} unique) in {total_sheets} sheets, "
+                 f"skipped {skipped_cells} cells in passthrough columns")
 
     # 保存翻译后的工作簿
     excel_wb.save(output_path)
     logging.info(f"Completed translation. Saved to: {output_path}")
 
-def _translate_cell_value(cell, translator, src_lang, tgt_lang):
-    """翻译单元格文本内容"""
+def translate_excel_streaming(translation_core, file_path, output_path, source_lang, target_lang, task):
+    """
+    流式翻译超大工作簿：read-only 模式逐行读取，write-only 模式逐行写出。
+    第一遍只收集去重后的文本，第二遍边读边写译文并复制单元格样式。
+    注意：write-only 模式不保留列宽、合并单元格等工作表级设置。
+    """
+    logging.info(f"Using streaming mode for large Excel file: {file_path}")
+
+    # 1. 收集阶段：只保留去重后的文本，不持有单元格对象
+    unique_texts = {}
+    # 列画像跳过的 (列字母, 文本)，按工作表记录，回写时保持原文
+    skipped_values = {}
+    skipped_cells = 0
+    profiler = ColumnProfiler() if EXCEL_COLUMN_PROFILING else None
+    read_wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for read_ws in read_wb.worksheets:
+            sheet_values = []
+            for row in read_ws.iter_rows(values_only=True):
+                for column_index, value in enumerate(row, 1):
+                    if isinstance(value, str) and value.strip():
+                        sheet_values.append(CellValue(get_column_letter(column_index), value))
+            if profiler is not None:
+                kept, skipped, _ = profiler.profile(read_ws.title, sheet_values)
+                if skipped:
+                    skipped_values[read_ws.title] = set(sheet_values) - set(kept)
+                    skipped_cells += skipped
+                sheet_values = kept
+            unique_texts.update(dict.fromkeys(entry.value for entry in sheet_values))
+    finally:
+        read_wb.close()
+
+    # 2. 翻译阶段
+    reporter = ProgressReporter(task)
+
+    translations = translation_core.translate_unique(
+        list(unique_texts),
+        source_lang,
+        target_lang,
+        progress_callback=reporter,
+        fallback_on_error=True
+    )
+    reporter.flush()
+    unique_texts.clear()
+
+    # 3. 回写阶段：逐行读取并写出
+    read_wb = load_workbook(file_path, read_only=True, data_only=True)
+    write_wb = Workbook(write_only=True)
     try:
-        return translator.translate_text(cell.value, src_lang, tgt_lang) if isinstance(cell.value, str) else cell.value
-    except Exception as e:
-        logging.error(f"Translation error at {cell.coordinate}: {str(e)}")
-        return cell.value  # 出错时返回原值
+        for read_ws in read_wb.worksheets:
+            write_ws = write_wb.create_sheet(title=read_ws.title)
+            sheet_skipped = skipped_values.get(read_ws.title, ())
+            for row in read_ws.iter_rows():
+                write_ws.append([_streaming_cell(write_ws, cell, translations, sheet_skipped) for cell in row])
+        write_wb.save(output_path)
+    finally:
+        read_wb.close()
+    logging.info(f"Completed streaming translation, skipped {skipped_cells} cells in passthrough columns. "
+                 f"Saved to: {output_path}")
+
+def _streaming_cell(write_ws, cell, translations, skipped_values=()):
+    """
+    把只读单元格转换为带样式的 write-only 单元格
+    :param skipped_values: 列画像跳过的 {CellValue(列字母, 文本)}，这些单元格保持原文
+    """
+    value = cell.value
+    if isinstance(value, str) and (not skipped_values
+                                   or CellValue(cell.column_letter, value) not in skipped_values):
+        value = translations.get(value, value)
+    if not getattr(cell, 'has_style', False):
+        return value
+    out_cell = WriteOnlyCell(write_ws, value=value)
+    out_cell.font = cell.font
+    out_cell.fill = cell.fill
+    out_cell.border = cell.border
+    out_cell.alignment = cell.alignment
+    out_cell.number_format = cell.number_format
+    out_cell.protection = cell.protection
+    return out_cell
+
+def _translate_sheets(translation_core, sheet_cells, source_lang, target_lang, reporter, skipped_cells=0):
+    """
+    按工作表并发翻译（最多 EXCEL_SHEET_WORKERS 个工作表同时进行）。
+    跨工作表重复的文本只分配给第一个工作表，进度按全部唯一文本汇总上报。
+    :param skipped_cells: 列画像跳过的单元格数，随进度一起上报
+    :return: {原文: 译文} 映射
+    """
+    sheet_texts = {}
+    seen = set()
+    for sheet_name, cells in sheet_cells.items():
+        texts = []
+        for cell in cells:
+            if cell.value not in seen:
+                seen.add(cell.value)
+                texts.append(cell.value)
+        if texts:
+            sheet_texts[sheet_name] = texts
+    total = len(seen)
+    done = {sheet_name: 0 for sheet_name in sheet_texts}
+    sheets_done = [0]
+    lock = threading.Lock()
+
+    def translate_sheet(sheet_name):
+        def on_progress(current, _sheet_total):
+            with lock:
+                done[sheet_name] = current
+                current_total = sum(done.values())
+            reporter.update(current_total, total, sheets_done=sheets_done[0], total_sheets=len(sheet_texts),
+                            skipped_cells=skipped_cells)
+
+        result = translation_core.translate_unique(
+            sheet_texts[sheet_name],
+            source_lang,
+            target_lang,
+            progress_callback=on_progress,
+            fallback_on_error=True
+        )
+        with lock:
+            sheets_done[0] += 1
+        logging.info(f"Sheet '{sheet_name}' translated: {len(result)} unique texts")
+        return result
+
+    translations = {}
+    workers = max(1, min(EXCEL_SHEET_WORKERS, len(sheet_texts)))
+    if workers == 1:
+        for sheet_name in sheet_texts:
+            translations.update(translate_sheet(sheet_name))
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="excel-sheet") as executor:
+            for result in executor.map(translate_sheet, sheet_texts):
+                translations.update(result)
+    reporter.update(total, total, sheets_done=len(sheet_texts), total_sheets=len(sheet_texts),
+                    skipped_cells=skipped_cells)
+    return translations
+
+def _collect_text_cells(excel_wb):
+    """按工作表收集所有非空文本单元格，返回 {工作表名: 单元格列表}"""
+    sheet_cells = {}
+    for sheet_name in excel_wb.sheetnames:
+        text_cells = []
+        for row in excel_wb[sheet_name].iter_rows():
+            for cell in row:
+                if cell.value is not None and isinstance(cell.value, str) and cell.value.strip():  # 检查单元格内容是否为空白字符串
+                    text_cells.append(cell)
+        sheet_cells[sheet_name] = text_cells
+    return sheet_cells
@@ -0,0 +1,84 @@
+import logging
+import os
+import tempfile
+import threading
+from gl_config import LOG_LEVEL
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+
+class CollectingTranslationCore:
+    """
+    收集用翻译核心：不调用模型，只记录各格式翻译器交给 translate_unique 的文本并原样返回。
+    用同一套格式翻译器跑一遍，即可得到与正常翻译完全一致的片段集合（含分块、列画像等规则）。
+    """
+    def __init__(self):
+        self.job_id = None
+        self.texts = {}
+        self._lock = threading.Lock()
+
+    def translate_unique(self, texts, source_lang, target_lang, progress_callback=None, fallback_on_error=False):
+        unique_texts = list(dict.fromkeys(text for text in texts if text and text.strip()))
+        with self._lock:
+            self.texts.update(dict.fromkeys(unique_texts))
+        return {text: text for text in unique_texts}
+
+    def cache_stats(self):
+        return {}
+
+
+class PresetTranslationCore:
+    """
+    预置译文的翻译核心：translate_unique 优先使用已翻译好的结果（来自分发的子任务），
+    缺失的文本交给真实的 TranslationCore 补译。
+    """
+    def __init__(self, translation_core, translations):
+        self.translation_core = translation_core
+        self.translations = translations
+
+    @property
+    def job_id(self):
+        return self.translation_core.job_id
+
+    @job_id.setter
+    def job_id(self, value):
+        self.translation_core.job_id = value
+
+    def translate_unique(self, texts, source_lang, target_lang, progress_callback=None, fallback_on_error=False):
+        unique_texts = list(dict.fromkeys(text for text in texts if text and text.strip()))
+        results = {text: self.translations[text] for text in unique_texts if text in self.translations}
+        missing = [text for text in unique_texts if text not in results]
+        if missing:
+            logging.info(f"预置译文缺少 {len(missing)} 个片段，补充翻译")
+            results.update(self.translation_core.translate_unique(
+                missing, source_lang, target_lang, fallback_on_error=fallback_on_error
+            ))
+        if progress_callback:
+            progress_callback(len(unique_texts), len(unique_texts))
+        return results
+
+    def cache_stats(self):
+        return self.translation_core.cache_stats()
+
+
+def collect_file_segments(translator_cls, file_path, source_lang, target_lang):
+    """
+    收集文件中需要翻译的唯一片段（不调用模型）
+    :param translator_cls: Translator 类
+    :return: 片段列表
+    """
+    collecting_core = CollectingTranslationCore()
+    extension = os.path.splitext(file_path)[1]
+    fd, scratch_path = tempfile.mkstemp(suffix=extension)
+    os.close(fd)
+    try:
+        translator_cls(collecting_core).translate_file(file_path, scratch_path, source_lang, target_lang, None)
+    finally:
+        os.remove(scratch_path)
+    return list(collecting_core.texts)
+
+
+def chunk_segments(segments, chunk_size):
+    """把片段列表切分为子任务大小的块"""
+    return [segments[i:i + chunk_size] for i in range(0, len(segments), chunk_size)]
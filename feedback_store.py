@@ -0,0 +1,143 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from gl_config import LOG_LEVEL, FEEDBACK_DB_PATH, FEEDBACK_FLUSH_SIZE, FEEDBACK_FLUSH_INTERVAL, FEEDBACK_MAX_BYTES
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+
+class FeedbackStore:
+    """
+    翻译反馈日志（SQLite，带索引）。
+    - 写入先进入内存缓冲，达到 FEEDBACK_FLUSH_SIZE 条或超过 FEEDBACK_FLUSH_INTERVAL 秒后批量落盘
+    - 多个 worker 进程通过 SQLite 文件锁安全地并发写入
+    - 数据量超过 FEEDBACK_MAX_BYTES 时删除最旧的 20% 记录
+    """
+    def __init__(self, db_path=FEEDBACK_DB_PATH, flush_size=FEEDBACK_FLUSH_SIZE,
+                 flush_interval=FEEDBACK_FLUSH_INTERVAL, max_bytes=FEEDBACK_MAX_BYTES):
+        self.db_path = db_path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self._buffer = []
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS feedback ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " created_at TEXT NOT NULL,"
+            " job_id TEXT,"
+            " source_lang TEXT, target_lang TEXT,"
+            " source_text TEXT, translated_text TEXT,"
+            " status TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_created_at ON feedback(created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_job_id ON feedback(job_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_langs ON feedback(source_lang, target_lang)")
+        self._conn.commit()
+        atexit.register(self.flush)
+
+    def record(self, source_text, translated_text, source_lang=None, target_lang=None, job_id=None, status=None):
+        """记录一条翻译反馈（先写入缓冲）"""
+        row = (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), job_id, source_lang, target_lang,
+               source_text, translated_text, status)
+        with self._lock:
+            self._buffer.append(row)
+            should_flush = (len(self._buffer) >= self.flush_size
+                            or time.time() - self._last_flush >= self.flush_interval)
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """把缓冲区中的记录批量写入数据库"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.time()
+            if not rows:
+                return
+            try:
+                self._conn.executemany(
+                    "INSERT INTO feedback (created_at, job_id, source_lang, target_lang,"
+                    " source_text, translated_text, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.commit()
+                self._rotate_if_needed()
+            except sqlite3.Error as e:
+                logging.error(f"写入翻译反馈日志失败: {e}")
+
+    def _rotate_if_needed(self):
+        """按数据量轮转：超过上限时删除最旧的 20% 记录（释放的页会被后续写入复用）"""
+        if not self.max_bytes:
+            return
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        if (page_count - freelist_count) * page_size <= self.max_bytes:
+            return
+        total = self._conn.execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+        to_delete = max(1, total // 5)
+        self._conn.execute(
+            "DELETE FROM feedback WHERE id IN (SELECT id FROM feedback ORDER BY id ASC LIMIT ?)",
+            (to_delete,)
+        )
+        self._conn.commit()
+        logging.info(f"翻译反馈日志轮转，删除最旧的 {to_delete} 条记录")
+
+    def query(self, page=1, per_page=100, date_from=None, date_to=None, lang=None, job_id=None):
+        """
+        分页查询反馈记录（按时间倒序）
+        :param date_from/date_to: 日期字符串 YYYY-MM-DD（包含当天）
+        :param lang: 源语言或目标语言
+        :return: (记录列表, 总条数)
+        """
+        conditions = []
+        params = []
+        if date_from:
+            conditions.append("created_at >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("created_at < date(?, '+1 day')")
+            params.append(date_to)
+        if lang:
+            conditions.append("(source_lang = ? OR target_lang = ?)")
+            params.extend([lang, lang])
+        if job_id:
+            conditions.append("job_id = ?")
+            params.append(job_id)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        self.flush()
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM feedback{where}", params).fetchone()[0]
+            cursor = self._conn.execute(
+                "SELECT created_at, job_id, source_lang, target_lang, source_text, translated_text, status"
+                f" FROM feedback{where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                params + [per_page, (max(1, page) - 1) * per_page]
+            )
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return rows, total
+
+
+_feedback_store = None
+_feedback_store_lock = threading.Lock()
+
+def get_feedback_store():
+    """获取当前进程的 FeedbackStore 单例"""
+    global _feedback_store
+    if _feedback_store is None:
+        with _feedback_store_lock:
+            if _feedback_store is None:
+                _feedback_store = FeedbackStore()
+    return _feedback_store
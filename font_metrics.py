@@ -0,0 +1,201 @@
+import logging
+import os
+import re
+import sys
+import threading
+import unicodedata
+from gl_config import LOG_LEVEL, PPT_FONT_DIRS, PPT_FALLBACK_FONTS
+
+try:
+    from fontTools.ttLib import TTFont, TTCollection
+except ImportError:  # fontTools 为可选依赖，缺失时退回到字号估算
+    TTFont = None
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc', '.otc')
+LINE_SPACING = 1.2  # 行高 = 字号 * 1.2
+SIZE_STEP = 0.5     # 二分查找的字号精度（pt）
+
+# 换行单位：连续的拉丁字母/数字作为一个词，空白单独成段，其余字符（CJK 等）逐字可断行
+_TOKEN_RE = re.compile(r'\s+|[0-9A-Za-z\u00c0-\u024f\'\-.,:;!?%)\]]+|.', re.DOTALL)
+
+
+def _system_font_dirs():
+    """各平台的系统字体目录"""
+    if sys.platform.startswith('win'):
+        windir = os.environ.get('WINDIR', r'C:\Windows')
+        return [os.path.join(windir, 'Fonts'),
+                os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Microsoft', 'Windows', 'Fonts')]
+    if sys.platform == 'darwin':
+        return ['/System/Library/Fonts', '/Library/Fonts', os.path.expanduser('~/Library/Fonts')]
+    return ['/usr/share/fonts', '/usr/local/share/fonts', os.path.expanduser('~/.fonts'),
+            os.path.expanduser('~/.local/share/fonts')]
+
+
+class FontMetrics:
+    """
+    基于本地字体文件（fontTools）的文本宽度测量：
+    - 首次使用时扫描字体目录，建立 字体族名 -> (文件, 序号) 索引（包括本地化名称，如“微软雅黑”）
+    - 每个字体的字符步进宽度表（按 em 归一化）只读取一次，不同字号按比例换算
+    - 字体缺失时按候选字体列表回退，都不可用时 available 为 False
+    """
+    def __init__(self, font_dirs=None, fallback_fonts=PPT_FALLBACK_FONTS):
+        self.font_dirs = list(font_dirs or []) + _system_font_dirs()
+        self.fallback_fonts = fallback_fonts
+        self._index = None
+        self._advances = {}
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return TTFont is not None and bool(self._font_index())
+
+    def _font_index(self):
+        """扫描字体目录（每个进程只做一次）"""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._scan_fonts() if TTFont is not None else {}
+        return self._index
+
+    def _scan_fonts(self):
+        index = {}
+        for font_dir in self.font_dirs:
+            if not font_dir or not os.path.isdir(font_dir):
+                continue
+            for root, _, files in os.walk(font_dir):
+                for file_name in files:
+                    if not file_name.lower().endswith(FONT_EXTENSIONS):
+                        continue
+                    path = os.path.join(root, file_name)
+                    try:
+                        if file_name.lower().endswith(('.ttc', '.otc')):
+                            fonts = TTCollection(path, lazy=True).fonts
+                        else:
+                            fonts = [TTFont(path, lazy=True)]
+                        for number, font in enumerate(fonts):
+                            for record in font['name'].names:
+                                if record.nameID in (1, 4):
+                                    index.setdefault(record.toUnicode().strip().lower(), (path, number))
+                    except Exception as e:
+                        logging.debug(f"跳过无法读取的字体 {path}: {e}")
+        logging.info(f"字体索引完成: {len(index)} 个字体名称")
+        return index
+
+    def _resolve(self, font_name):
+        """返回可用字体的索引键，依次尝试指定字体和候选字体"""
+        index = self._font_index()
+        for name in [font_name] + list(self.fallback_fonts):
+            if name and name.strip().lower() in index:
+                return name.strip().lower()
+        return None
+
+    def _advance_table(self, key):
+        """读取字体的字符步进宽度表：{字符码位: em 宽度}"""
+        table = self._advances.get(key)
+        if table is None:
+            path, number = self._font_index()[key]
+            font = TTFont(path, fontNumber=number, lazy=True)
+            units_per_em = font['head'].unitsPerEm
+            metrics = font['hmtx'].metrics
+            table = {code: metrics[glyph][0] / units_per_em
+                     for code, glyph in font.getBestCmap().items() if glyph in metrics}
+            font.close()
+            self._advances[key] = table
+        return table
+
+    def text_width_em(self, font_name, text):
+        """
+        计算文本宽度（em，乘以字号即为 pt）
+        :return: 宽度；没有可用字体时返回 None
+        """
+        key = self._resolve(font_name)
+        if key is None:
+            return None
+        return _text_width_em(self._advance_table(key), text)
+
+    def wrap_tokens(self, font_name, text):
+        """把文本拆分为换行单位，返回 [(宽度em, 是否空白)]；没有可用字体时返回 None"""
+        key = self._resolve(font_name)
+        if key is None:
+            return None
+        table = self._advance_table(key)
+        return [(_text_width_em(table, token), token.isspace()) for token in _TOKEN_RE.findall(text)]
+
+    def fit_font_size(self, font_name, paragraphs, width_pt, height_pt, max_size, min_size):
+        """
+        二分查找能放入文本框的最大字号
+        :param paragraphs: 各段落文本
+        :return: 字号（pt）；没有可用字体时返回 None
+        """
+        if width_pt <= 0 or height_pt <= 0:
+            return None
+        token_lists = []
+        for text in paragraphs:
+            tokens = self.wrap_tokens(font_name, text)
+            if tokens is None:
+                return None
+            token_lists.append(tokens)
+
+        def fits(size):
+            capacity = width_pt / size
+            lines = sum(_count_lines(tokens, capacity) for tokens in token_lists)
+            return lines * size * LINE_SPACING <= height_pt
+
+        if fits(max_size):
+            return max_size
+        low, high = min_size, max_size
+        while high - low > SIZE_STEP:
+            middle = (low + high) / 2
+            if fits(middle):
+                low = middle
+            else:
+                high = middle
+        return low
+
+
+def _char_width_em(table, char):
+    width = table.get(ord(char))
+    if width is None:
+        # 字体中缺失的字符：全角字符按 1em，其余按 0.5em 估算
+        width = 1.0 if unicodedata.east_asian_width(char) in ('W', 'F') else 0.5
+    return width
+
+def _text_width_em(table, text):
+    return sum(_char_width_em(table, char) for char in text)
+
+def _count_lines(tokens, capacity):
+    """贪心换行，返回行数（空段落占一行）"""
+    lines = 1
+    line_width = 0.0
+    for width, is_space in tokens:
+        if line_width + width <= capacity:
+            line_width += width
+        elif is_space:
+            continue  # 行尾空白不换行
+        elif width > capacity:
+            # 超长单词：按容量强制断开
+            if line_width > 0:
+                lines += 1
+            full_lines, line_width = divmod(width, capacity)
+            lines += int(full_lines) - (0 if line_width else 1)
+            line_width = line_width or capacity
+        else:
+            lines += 1
+            line_width = width
+    return lines
+
+
+_font_metrics = None
+_font_metrics_lock = threading.Lock()
+
+def get_font_metrics():
+    """获取当前进程的 FontMetrics 单例"""
+    global _font_metrics
+    if _font_metrics is None:
+        with _font_metrics_lock:
+            if _font_metrics is None:
+                _font_metrics = FontMetrics(PPT_FONT_DIRS)
+    return _font_metrics
@@ -15,17 +15,133 @@ ENDPOINT_URL = "http://127.0.0.1:11434/v1"
 TEMPERATURE = 0.3
 API_KEY = None
 
+# Translation feedback log (SQLite, buffered writes, size-based rotation)
+FEEDBACK_DB_PATH = 'logfiles/translation_feedback.db'
+FEEDBACK_FLUSH_SIZE = 200
+FEEDBACK_FLUSH_INTERVAL = 5  # seconds
+FEEDBACK_MAX_BYTES = 200 * 1024 * 1024
+FEEDBACK_PAGE_SIZE = 100
+
+# Excel workbooks at least this large (bytes) are translated in streaming mode
+# (read-only/write-only openpyxl) so memory stays flat regardless of row count.
+# Set to 0 to disable streaming mode.
+EXCEL_STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024
+# Excel (.xlsx) translation engine:
+#   'openpyxl'      - load the workbook with openpyxl and write cell values back
+#   'sharedstrings' - translate xl/sharedStrings.xml and inline strings in place,
+#                     copying every other part (shapes, charts, formulas) unchanged
+EXCEL_ENGINE = 'openpyxl'
+# Number of worksheets translated concurrently by the openpyxl engine
+# (all sheets share the MAX_CONCURRENCY in-flight request limit). 1 = sequential.
+EXCEL_SHEET_WORKERS = 4
+# Column profiling: columns where at least EXCEL_PASSTHROUGH_RATIO of the text cells
+# look non-linguistic (hex IDs, signal names, part numbers, units) are skipped.
+# Only columns with at least EXCEL_PROFILE_MIN_CELLS text cells are profiled.
+# EXCEL_COLUMN_OVERRIDES forces a column mode: {'D': 'passthrough', 'Sheet1!B': 'translate'}
+EXCEL_COLUMN_PROFILING = True
+EXCEL_PASSTHROUGH_RATIO = 0.9
+EXCEL_PROFILE_MIN_CELLS = 5
+EXCEL_COLUMN_OVERRIDES = {}
+
+# PowerPoint font fitting measures glyph advances from local font files (fontTools).
+# Extra font directories searched before the system font folders, and the fonts
+# used when a run's font is not installed or not set (inherited from the theme).
+PPT_FONT_DIRS = []
+PPT_FALLBACK_FONTS = ['Calibri', 'Arial', 'Microsoft YaHei', 'Yu Gothic', 'MS Gothic', 'DejaVu Sans']
+# Shard slide extraction/write-back across worker processes for decks with at least
+# PPT_SHARD_MIN_SLIDES slides. LLM calls stay in the main process. 0 or 1 = disabled.
+PPT_SHARD_WORKERS = 0
+PPT_SHARD_MIN_SLIDES = 50
+
+# Word translation granularity:
+#   'paragraph' - translate the joined text of each paragraph once and split the
+#                 result back over the original runs (keeps run formatting)
+#   'run'       - translate every formatted run separately
+WORD_TRANSLATION_MODE = 'paragraph'
+# Word documents at least this large (bytes) are translated by the streaming OOXML
+# engine (incremental XML parsing, no python-docx object tree). 0 = disabled.
+WORD_STREAMING_THRESHOLD_BYTES = 10 * 1024 * 1024
+
+# Task progress reporting: write PROGRESS state at most every N ms,
+# unless progress advanced by at least this many percentage points
+PROGRESS_MIN_INTERVAL_MS = 1000
+PROGRESS_MIN_PERCENT_STEP = 5.0
+
+# Task progress events pushed to the browser over SSE (/task_events/<task_id>):
+#   'redis' - workers publish on the task_events:<task_id> pub/sub channel
+#   'local' - in-process delivery only (single process / eager Celery)
+TASK_EVENTS_BACKEND = 'redis'
+# Latest event kept per task in the web process, for clients that connect mid-task
+TASK_EVENTS_CACHE_SIZE = 10000
+# Seconds between SSE keep-alive comments on an idle connection
+TASK_EVENTS_KEEPALIVE = 15
+
 # Redis configuration
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
 REDIS_DB = 0
 REDIS_PASSWORD = None
 
+# Celery queues: short text requests and file jobs are routed to separate queues.
+# Low text latency requires a dedicated `-Q text` worker: a worker consuming both
+# queues picks TEXT_QUEUE first, but cannot start a text task while it is busy with
+# a long file job. Workers prefetch one message at a time.
+TEXT_QUEUE = 'text'
+FILE_QUEUE = 'files'
+# Number of most recent queue-wait samples kept per queue (Redis list) for /queue_stats
+QUEUE_WAIT_SAMPLES = 1000
+
+# Segment-level fan-out: files with at least FANOUT_MIN_SEGMENTS unique segments are
+# split into subtasks of FANOUT_CHUNK_SEGMENTS segments, translated by all workers
+# and merged into the output file by a final chord callback
+FANOUT_ENABLED = False
+FANOUT_MIN_SEGMENTS = 500
+FANOUT_CHUNK_SEGMENTS = 100
+
 # Other configurations
 MAX_RETRY = 3
 
 # Whether to use reflection and improvement functionality
 USE_REFLECTION = False
+# Segments shorter than this are not checked for length-ratio anomalies by the reflection gate
+REFLECTION_MIN_LENGTH = 8
+
+# Prompt template version, part of the translation cache key.
+# prompt_registry appends a fingerprint of the templates, so editing a
+# template invalidates cached translations even without a manual bump.
+PROMPT_VERSION = 'v1'
+
+# Persistent translation cache (SQLite, shared by all workers on this host)
+CACHE_ENABLED = True
+CACHE_DB_PATH = 'cache/translation_cache.db'
+CACHE_MAX_ENTRIES = 200000
+
+# Per-job checkpoints: completed segments are saved by (job ID, segment ID) so a
+# retried or resumed job only translates what is left (SQLite, local to this host)
+CHECKPOINT_ENABLED = True
+CHECKPOINT_DB_PATH = 'cache/checkpoints.db'
+# A running job holds a lease in the checkpoint DB that its worker renews every
+# third of this period; /resume only restarts a job that failed or whose lease
+# expired (its worker is gone), never one that is still being executed
+CHECKPOINT_LEASE_SECONDS = 300
+# File tasks are acknowledged only after they finish (acks_late), so the Redis broker
+# redelivers any task still unacknowledged after this many seconds, even if it is
+# still running. Keep it above the longest expected job (large decks run for hours);
+# a task lost with a crashed worker is redelivered after the same delay.
+BROKER_VISIBILITY_TIMEOUT = 24 * 3600
+
+# Multi-segment batched prompts: segments are packed into one request
+# until either the character budget or the segment limit is reached
+BATCH_MAX_CHARS = 2000
+BATCH_MAX_SEGMENTS = 20
+
+# Maximum number of in-flight LLM requests per TranslationCore (i.e. per worker
+# process), shared by all concurrent callers such as Excel sheet threads.
+# Keep it in line with OLLAMA_NUM_PARALLEL on the Ollama server.
+MAX_CONCURRENCY = 4
+
+# Size of the keep-alive HTTP connection pool to ENDPOINT_URL (per worker process)
+HTTP_MAX_CONNECTIONS = 8
 
 # Mapping of MIME types to abbreviation forms
 MIME_TO_EXTENSION = {
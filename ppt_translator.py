@@ -7,7 +7,13 @@ import traceback
 from pptx.util import Inches
 import re
 import math
-from gl_config import LOG_LEVEL
+from concurrent.futures import ProcessPoolExecutor
+from pptx.opc.oxml import serialize_part_xml
+from pptx.oxml import parse_xml
+from pptx.shapes.shapetree import SlideShapes
+from gl_config import LOG_LEVEL, PPT_SHARD_WORKERS, PPT_SHARD_MIN_SLIDES
+from progress_reporter import ProgressReporter
+from font_metrics import get_font_metrics
 
 
 # 配置日志记录
@@ -29,6 +35,22 @@ class pptTextFormat:
         self.margin_left = margin_left
         self.margin_right = margin_right
 
+class pptSegment:
+    """
+    文本框架的中间表示（单次遍历收集）：
+    保存文本框架、所在容器以及每个段落的 (对齐方式, 合并文本, 各run格式)。
+    翻译、进度统计和字体调整都基于该列表完成，不再重复遍历幻灯片。
+    """
+    def __init__(self, text_frame, container, paragraphs):
+        self.text_frame = text_frame
+        self.container = container
+        self.paragraphs = paragraphs
+        self.changed = False  # 回写后译文是否与原文不同
+
+    def chunks(self):
+        """返回需要翻译的文本分块（长段落先分块）"""
+        return [chunk for _, text, _ in self.paragraphs if text.strip() for chunk in split_text(text)]
+
 def split_text(text, max_length=1000):
     """分割长文本"""
     if len(text) <= max_length:
@@ -144,17 +166,6 @@ def apply_text_format(run, format_info, shape=None, text=None):
     except Exception as e:
         logging.warning(f"格式应用失败: {e}")
 
-def translate_text_with_format(translation_core, text, source_lang, target_lang):
-    """翻译文本（保持原逻辑）"""
-    if not text.strip():
-        return ""
-    text_chunks = split_text(text)
-    translated_chunks = []
-    for chunk in text_chunks:
-        translated_chunk = translation_core.translate_text(chunk, source_lang, target_lang)
-        translated_chunks.append(translated_chunk)
-    return "".join(translated_chunks)
-
 def get_separators(language):
     """获取分隔符（保持原逻辑）"""
     if language == "Chinese":
@@ -188,59 +199,65 @@ def split_text_into_parts(text, num_parts, target_lang):
     return split_texts
 
 # ----------------------- 辅助函数 -----------------------
-def scan_shape(shape):
-    """扫描形状（保持原逻辑）"""
-    total = 0
+def collect_text_frame(text_frame):
+    """收集文本框架中每个段落的合并文本和各run的格式"""
+    paragraph_infos = []
+    for paragraph in text_frame.paragraphs:
+        combined_text = ""
+        format_infos = []
+        for run in paragraph.runs:
+            if run.text:
+                combined_text += run.text
+                # 获取每个run的完整格式信息
+                format_infos.append(get_text_format(run))
+        paragraph_infos.append((paragraph.alignment, combined_text, format_infos))
+    return paragraph_infos
+
+def collect_shape(shape, segments):
+    """收集形状中的所有文本框架（含表格和组合形状）"""
     if hasattr(shape, "has_text_frame") and shape.has_text_frame:
-        for paragraph in shape.text_frame.paragraphs:
-            if paragraph.runs:
-                for run in paragraph.runs:
-                    if run.text.strip():
-                        total += len(run.text)
-            else:
-                if paragraph.text.strip():
-                    total += len(paragraph.text)
-    if hasattr(shape, "has_table") and shape.has_table:
+        segments.append(pptSegment(shape.text_frame, shape, collect_text_frame(shape.text_frame)))
+    elif hasattr(shape, "has_table") and shape.has_table:
         for row in shape.table.rows:
             for cell in row.cells:
                 if cell.text.strip():
-                    total += len(cell.text)
+                    segments.append(pptSegment(cell.text_frame, cell, collect_text_frame(cell.text_frame)))
     if hasattr(shape, "shapes"):
         for sub_shape in shape.shapes:
-            total += scan_shape(sub_shape)
-    return total
+            collect_shape(sub_shape, segments)
 
-def process_text_frame(text_frame, container, translation_core, source_lang, target_lang, task, current_work, total_work):
-    """处理文本框架（增强颜色保持）"""
+def collect_segments(prs):
+    """单次遍历整个演示文稿，返回 pptSegment 列表"""
+    segments = []
+    for slide in prs.slides:
+        for shape in slide.shapes:
+            collect_shape(shape, segments)
+    return segments
+
+def translate_paragraph_text(text, translations):
+    """按分块从去重翻译结果中拼出整段译文"""
+    return "".join(translations.get(chunk, chunk) for chunk in split_text(text))
+
+def apply_segment(segment, translations, target_lang):
+    """
+    把译文写回文本框架（增强颜色保持）
+    :return: 译文是否与原文不同；没有变化的文本框架保持原样不重写
+    """
+    text_frame, container = segment.text_frame, segment.container
     paragraph_formats = []
-    for paragraph in text_frame.paragraphs:
-        alignment = paragraph.alignment
+    for alignment, combined_text, format_infos in segment.paragraphs:
         runs_info = []
-        combined_text = ""
-        format_infos = []
-        for run in paragraph.runs:
-            if run.text:
-                combined_text += run.text
-                # 获取每个run的完整格式信息
-                format_infos.append(get_text_format(run))
         if combined_text.strip():
-            translated_text = translate_text_with_format(translation_core, combined_text, source_lang, target_lang)
+            translated_text = translate_paragraph_text(combined_text, translations)
+            if translated_text != combined_text:
+                segment.changed = True
             # 保持原始run的数量和格式对应
             split_texts = split_text_into_parts(translated_text, len(format_infos), target_lang)
             runs_info.append((split_texts, format_infos))
-            current_work[0] += len(combined_text)
-            progress = (current_work[0] / total_work) * 100
-            if task is not None:
-                task.update_state(
-                    state='PROGRESS',
-                    meta={
-                        'current': current_work[0],
-                        'total': total_work,
-                        'progress': round(progress, 1)
-                    }
-                )
         paragraph_formats.append((alignment, runs_info))
-    
+    if not segment.changed:
+        return False
+
     # 清空文本但保留段落结构
     while len(text_frame.paragraphs) > 1:
         p = text_frame.paragraphs[-1]
@@ -264,38 +281,26 @@ def process_text_frame(text_frame, container, translation_core, source_lang, tar
                 run.text = split_text
                 # 应用原始run的格式（包含颜色）
                 apply_text_format(run, format_info, container, split_text)
-
-def process_table(table, translation_core, source_lang, target_lang, task, current_work, total_work):
-    """处理表格（保持原逻辑）"""
-    for row in table.rows:
-        for cell in row.cells:
-            if cell.text.strip():
-                process_text_frame(cell.text_frame, cell, translation_core, source_lang, target_lang, task, current_work, total_work)
-
-def process_shape(shape, translation_core, source_lang, target_lang, task, current_work, total_work):
-    """处理形状（保持原逻辑）"""
-    if hasattr(shape, "has_text_frame") and shape.has_text_frame:
-        process_text_frame(shape.text_frame, shape, translation_core, source_lang, target_lang, task, current_work, total_work)
-    elif hasattr(shape, "has_table") and shape.has_table:
-        process_table(shape.table, translation_core, source_lang, target_lang, task, current_work, total_work)
-    if hasattr(shape, "shapes"):
-        for sub_shape in shape.shapes:
-            process_shape(sub_shape, translation_core, source_lang, target_lang, task, current_work, total_work)
+    return True
 
 # ----------------------- 后处理 -----------------------
 def adjust_text_frame_font_size(text_frame, container):
     """
     改进后的字体调整逻辑：
     1. 使用加权平均计算字体大小
-    2. 更精确的字符宽度估算
-    3. 强制最小字号限制
+    2. 有本地字体时按真实字符宽度换行，二分查找能放下的字号（不需要缩小时保持原字号）
+    3. 没有可用字体时按平均字符宽度估算
+    4. 强制最小字号限制
     """
     total_text = ""
     total_chars = 0
     sum_font_size = 0.0
+    paragraph_texts = []
+    font_chars = {}
     
     # 第一次遍历：收集文本信息和计算加权平均字号
     for paragraph in text_frame.paragraphs:
+        paragraph_texts.append("".join(run.text for run in paragraph.runs))
         for run in paragraph.runs:
             run_text = run.text.strip()
             if run_text:
@@ -303,6 +308,7 @@ def adjust_text_frame_font_size(text_frame, container):
                 char_count = len(run_text)
                 total_chars += char_count
                 total_text += run_text
+                font_chars[run.font.name] = font_chars.get(run.font.name, 0) + char_count
                 
                 # 获取当前run的字号（没有设置时使用默认12pt）
                 run_size = run.font.size.pt if run.font.size else 12.0  # 修改为翻译前的字体大小
@@ -320,6 +326,24 @@ def adjust_text_frame_font_size(text_frame, container):
     except AttributeError:
         return
 
+    # 最小字号限制
+    min_font_size = 8.0
+
+    # 按真实字形宽度测量（以字符数最多的字体为准）
+    font_metrics = get_font_metrics()
+    if font_metrics.available:
+        font_name = max(font_chars, key=font_chars.get)
+        fitted_size = font_metrics.fit_font_size(
+            font_name, paragraph_texts,
+            width_pt - (text_frame.margin_left + text_frame.margin_right) / 12700.0,
+            height_pt - (text_frame.margin_top + text_frame.margin_bottom) / 12700.0,
+            avg_font_size, min(min_font_size, avg_font_size)
+        )
+        if fitted_size is not None:
+            if fitted_size < avg_font_size:
+                _scale_runs(text_frame, fitted_size / avg_font_size, avg_font_size, min_font_size)
+            return
+
     # 字符宽度估算（根据实际测试调整系数）
     avg_char_width = avg_font_size * 1.0  # 原1.2改为0.6更符合实际
     
@@ -342,11 +366,10 @@ def adjust_text_frame_font_size(text_frame, container):
     
     # 应用二次缩放（更保守的缩放）
     scaling_factor *= 0.95  # 预留5%的边距
-    
-    # 最小字号限制
-    min_font_size = 8.0
-    
-    # 第二次遍历：应用缩放
+    _scale_runs(text_frame, scaling_factor, avg_font_size, min_font_size)
+
+def _scale_runs(text_frame, scaling_factor, avg_font_size, min_font_size):
+    """按缩放因子调整文本框架中每个run的字号"""
     for paragraph in text_frame.paragraphs:
         for run in paragraph.runs:
             if run.text.strip():
@@ -362,34 +385,82 @@ def adjust_text_frame_font_size(text_frame, container):
                 # 应用新字号
                 run.font.size = Pt(new_size)
 
-def adjust_shape_font_size(shape):
-    """形状字体调整（增加异常处理）"""
+def fit_segment_font_size(segment):
+    """调整回写后文本框架的字号（增加异常处理）"""
     try:
-        if not hasattr(shape, 'width') or not hasattr(shape, 'height'):
-            return
-        
-        # 文本框处理
-        if hasattr(shape, "has_text_frame") and shape.has_text_frame:
-            adjust_text_frame_font_size(shape.text_frame, shape)
-        
-        # 表格处理
-        if hasattr(shape, "has_table") and shape.has_table:
-            for row in shape.table.rows:
-                for cell in row.cells:
-                    adjust_text_frame_font_size(cell.text_frame, cell)
-        
-        # 递归处理组合形状
-        if hasattr(shape, "shapes"):
-            for sub_shape in shape.shapes:
-                adjust_shape_font_size(sub_shape)
+        adjust_text_frame_font_size(segment.text_frame, segment.container)
     except Exception as e:
-        logging.warning(f"字体调整失败: {str(e)}")                
+        logging.warning(f"字体调整失败: {str(e)}")
 
-def adjust_font_size_for_all_shapes(prs):
-    """统一调整字体（保持原逻辑）"""
-    for slide in prs.slides:
-        for shape in slide.shapes:
-            adjust_shape_font_size(shape)
+# ----------------------- 多进程分片 -----------------------
+class pptShapeBox:
+    """占位符在工作进程中无法读取版式继承的尺寸，由主进程预先计算后以此代替"""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+def _slide_segments(slide_xml):
+    """在工作进程中从幻灯片 XML 重建形状并收集 pptSegment"""
+    sld = parse_xml(slide_xml)
+    segments = []
+    for shape in SlideShapes(sld.cSld.spTree, None):
+        collect_shape(shape, segments)
+    return sld, segments
+
+def extract_slide_chunks(slide_xml):
+    """工作进程：收集一张幻灯片中需要翻译的文本分块"""
+    _, segments = _slide_segments(slide_xml)
+    return [chunk for segment in segments for chunk in segment.chunks()]
+
+def apply_slide_translations(args):
+    """
+    工作进程：把译文写回一张幻灯片并调整字号
+    :return: (新的幻灯片 XML，没有变化时为 None, 变化的文本框架数)
+    """
+    slide_xml, translations, target_lang, placeholder_sizes = args
+    sld, segments = _slide_segments(slide_xml)
+    changed = 0
+    for segment in segments:
+        if apply_segment(segment, translations, target_lang):
+            if getattr(segment.container, 'is_placeholder', False):
+                segment.container = pptShapeBox(*placeholder_sizes.get(segment.container.shape_id, (None, None)))
+            fit_segment_font_size(segment)
+            changed += 1
+    return (serialize_part_xml(sld) if changed else None), changed
+
+def translate_slides_sharded(prs, translation_core, source_lang, target_lang, reporter, workers):
+    """
+    按幻灯片分片到多个进程完成文本收集和回写（XML 处理、文本拆分、格式复制、字号调整），
+    主进程只负责并发调用模型，结果与单进程模式一致。
+    :return: 变化的文本框架数
+    """
+    slides = list(prs.slides)
+    slide_xmls = [serialize_part_xml(slide.part._element) for slide in slides]
+    chunksize = max(1, len(slides) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 1. 收集阶段
+        slide_chunks = list(executor.map(extract_slide_chunks, slide_xmls, chunksize=chunksize))
+
+        # 2. 翻译阶段
+        translations = translation_core.translate_unique(
+            [chunk for chunks in slide_chunks for chunk in chunks],
+            source_lang, target_lang, progress_callback=reporter
+        )
+
+        # 3. 回写阶段：每张幻灯片只携带自己用到的译文
+        jobs = []
+        for slide, slide_xml, chunks in zip(slides, slide_xmls, slide_chunks):
+            placeholder_sizes = {shape.shape_id: (shape.width, shape.height) for shape in slide.placeholders}
+            slide_translations = {chunk: translations[chunk] for chunk in chunks if chunk in translations}
+            jobs.append((slide_xml, slide_translations, target_lang, placeholder_sizes))
+        changed = 0
+        for slide, (new_xml, slide_changed) in zip(slides, executor.map(apply_slide_translations, jobs,
+                                                                         chunksize=chunksize)):
+            if new_xml is not None:
+                # 原地替换幻灯片根元素的子元素，部件及其他对象持有的根元素引用保持有效
+                slide.part._element[:] = list(parse_xml(new_xml))
+            changed += slide_changed
+    return changed
 
 # ----------------------- 主函数 -----------------------
 def translate_powerpoint(translation_core, file_path, output_path, source_lang, target_lang, task):
@@ -397,15 +468,30 @@ def translate_powerpoint(translation_core, file_path, output_path, source_lang,
     logging.info(f"开始翻译PPT文件: {file_path}")
     try:
         prs = Presentation(file_path)
-        total_work = 0
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                total_work += scan_shape(shape)
-        current_work = [0]
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                process_shape(shape, translation_core, source_lang, target_lang, task, current_work, total_work)
-        adjust_font_size_for_all_shapes(prs)
+        reporter = ProgressReporter(task)
+        if PPT_SHARD_WORKERS > 1 and len(prs.slides) >= PPT_SHARD_MIN_SLIDES:
+            logging.info(f"按幻灯片分片到 {PPT_SHARD_WORKERS} 个进程处理")
+            changed = translate_slides_sharded(prs, translation_core, source_lang, target_lang,
+                                               reporter, PPT_SHARD_WORKERS)
+            reporter.flush()
+            logging.info(f"回写 {changed} 个文本框架")
+        else:
+            # 1. 收集阶段：单次遍历构建文本框架中间表示
+            segments = collect_segments(prs)
+
+            # 2. 翻译阶段：长段落先分块，再对所有分块去重翻译
+            chunks = [chunk for segment in segments for chunk in segment.chunks()]
+
+            translations = translation_core.translate_unique(chunks, source_lang, target_lang, progress_callback=reporter)
+            reporter.flush()
+
+            # 3. 回写阶段：只对译文有变化的文本框架调整字号
+            changed = 0
+            for segment in segments:
+                if apply_segment(segment, translations, target_lang):
+                    fit_segment_font_size(segment)
+                    changed += 1
+            logging.info(f"回写 {changed}/{len(segments)} 个文本框架")
         prs.save(output_path)
         logging.info(f"PPT翻译完成: {output_path}")
     except Exception as e:
@@ -0,0 +1,102 @@
+import re
+import logging
+from gl_config import LOG_LEVEL
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+# 前置检查分类结果
+EMPTY = 'empty'                        # 空白内容
+TECHNICAL = 'technical'                # 技术内容（缩写/编号/符号）
+TARGET_LANGUAGE = 'target_language'    # 已经是目标语言
+UNTRANSLATABLE = 'untranslatable'      # 单字符等无需翻译的输入
+NEEDS_TRANSLATION = 'needs_translation'
+
+# Unicode 文字区段（预编译，计数在正则引擎中完成）
+_HAN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+_KANA_RE = re.compile(r'[\u3040-\u309f\u30a0-\u30ff\u31f0-\u31ff\uff66-\uff9f]')
+_LATIN_RE = re.compile(r'[A-Za-z\u00c0-\u024f]')
+_LOWER_RE = re.compile(r'[a-z]')
+
+# 常见技术标记：十六进制数值、带下划线的信号名/标识符
+_TOKEN_RE = re.compile(r'^(?:0[xX][0-9A-Fa-f]+|[A-Za-z0-9]*_[A-Za-z0-9_]*)$')
+
+# 目标文字在字母类字符中的最低占比
+TARGET_SCRIPT_RATIO = 0.3
+
+
+def script_histogram(text):
+    """统计文本的文字分布（汉字/假名/拉丁字母）"""
+    return {
+        'han': len(_HAN_RE.findall(text)),
+        'kana': len(_KANA_RE.findall(text)),
+        'latin': len(_LATIN_RE.findall(text)),
+    }
+
+
+class PreTranslationFilter:
+    """
+    确定性的翻译前置分类器，替代逐段 langdetect 检测和正则重复编译。
+    基于预编译的技术内容模式和 Unicode 文字分布判断片段是否需要翻译。
+    """
+    def __init__(self, acronym_manager):
+        self.industry_abbreviations = {abbr.upper() for abbr in acronym_manager.industry_abbreviations}
+        # 技术格式（仅允许大写字母、数字、技术符号），只编译一次
+        self.technical_pattern = re.compile(
+            rf'^[{acronym_manager.alphanumeric_chars}{acronym_manager.special_characters}]*$', re.ASCII
+        )
+
+    def classify(self, text, target_lang, source_lang=None):
+        """返回单个片段的分类结果"""
+        # 空值检查
+        if not text or not text.strip():
+            return EMPTY
+        stripped_text = text.strip()
+
+        # 技术内容检查：行业缩写，或不含小写字母且只由技术字符组成
+        if stripped_text.upper() in self.industry_abbreviations:
+            return TECHNICAL
+        if not _LOWER_RE.search(stripped_text) and self.technical_pattern.match(stripped_text):
+            return TECHNICAL
+        if _TOKEN_RE.match(stripped_text):
+            return TECHNICAL
+
+        # 目标语言检查
+        histogram = script_histogram(stripped_text)
+        # 字母类字符按 Unicode 统计（含西里尔、韩文、希腊、阿拉伯等其他文字）
+        letters = sum(1 for ch in stripped_text if ch.isalpha())
+        if letters == 0:
+            # 没有任何文字（纯数字/符号），无需翻译
+            return TECHNICAL
+        if self._is_target_language(histogram, letters, target_lang, source_lang):
+            return TARGET_LANGUAGE
+
+        # 单字符/无效输入检查
+        if len(stripped_text) <= 1 and not stripped_text.isdigit():
+            return UNTRANSLATABLE
+        return NEEDS_TRANSLATION
+
+    def classify_batch(self, texts, target_lang, source_lang=None):
+        """批量分类，文档内重复的片段只计算一次"""
+        memo = {}
+        labels = []
+        for text in texts:
+            label = memo.get(text)
+            if label is None:
+                label = memo[text] = self.classify(text, target_lang, source_lang)
+            labels.append(label)
+        return labels
+
+    def _is_target_language(self, histogram, letters, target_lang, source_lang):
+        """根据文字分布判断片段是否已经是目标语言"""
+        han, kana, latin = histogram['han'], histogram['kana'], histogram['latin']
+        if target_lang == 'English':
+            return han == 0 and kana == 0 and latin / letters >= TARGET_SCRIPT_RATIO
+        if target_lang == 'Chinese':
+            return kana == 0 and han / letters >= TARGET_SCRIPT_RATIO
+        if target_lang == 'Japanese':
+            if kana > 0:
+                return (han + kana) / letters >= TARGET_SCRIPT_RATIO
+            # 纯汉字文本：源语言为中文时需要翻译，否则视为日文汉字
+            return source_lang != 'Chinese' and han / letters >= TARGET_SCRIPT_RATIO
+        return False
@@ -0,0 +1,67 @@
+import logging
+import threading
+import time
+from gl_config import LOG_LEVEL, PROGRESS_MIN_INTERVAL_MS, PROGRESS_MIN_PERCENT_STEP
+from task_events import publish_task_event
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+
+class ProgressReporter:
+    """
+    节流、合并的任务进度上报器，供所有格式的翻译器共用。
+    - 距上次上报超过 min_interval_ms 毫秒，或进度前进超过 min_percent_step 个百分点时才写入结果后端
+    - 其余更新被合并，只保留最新状态；完成（current >= total）和 flush() 时总会写入最终状态
+    - 统计被抑制的更新次数用于诊断
+    - 每次写入同时发布到任务事件频道，供 /task_events SSE 推送
+    可直接作为 TranslationCore.translate_unique 的 progress_callback 使用。
+    回调可能在翻译引擎的事件循环线程或工作表线程中执行，而 Celery 的 task.request 是线程局部的，
+    因此任务 ID 在创建时（调用方线程）取得，写入时显式传入。
+    """
+    def __init__(self, task, min_interval_ms=PROGRESS_MIN_INTERVAL_MS, min_percent_step=PROGRESS_MIN_PERCENT_STEP):
+        self.task = task
+        self.task_id = task.request.id if task is not None else None
+        self.min_interval = min_interval_ms / 1000.0
+        self.min_percent_step = min_percent_step
+        self.emitted = 0
+        self.suppressed = 0
+        self._last_time = None
+        self._last_progress = None
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def __call__(self, current, total):
+        self.update(current, total)
+
+    def update(self, current, total, **extra_meta):
+        """提交一次进度更新，按节流规则决定是否立即写入"""
+        progress = round(current / total * 100, 1) if total else 100.0
+        meta = {'current': current, 'total': total, 'progress': progress}
+        meta.update(extra_meta)
+        with self._lock:
+            now = time.monotonic()
+            if (self._last_time is None
+                    or current >= total
+                    or now - self._last_time >= self.min_interval
+                    or progress - self._last_progress >= self.min_percent_step):
+                self._emit(meta, now)
+            else:
+                self._pending = meta
+                self.suppressed += 1
+
+    def flush(self):
+        """写入被合并的最新状态，并记录上报统计"""
+        with self._lock:
+            if self._pending is not None:
+                self._emit(self._pending, time.monotonic())
+        logging.info(f"Progress updates: {self.emitted} emitted, {self.suppressed} suppressed")
+
+    def _emit(self, meta, now):
+        self._pending = None
+        self._last_time = now
+        self._last_progress = meta['progress']
+        self.emitted += 1
+        if self.task is not None:
+            self.task.update_state(task_id=self.task_id, state='PROGRESS', meta=meta)
+            publish_task_event(self.task_id, 'PROGRESS', meta)
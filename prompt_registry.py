@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+import threading
+from langchain.prompts import ChatPromptTemplate
+from langchain.schema import StrOutputParser
+from gl_config import LOG_LEVEL, PROMPT_VERSION
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+# 翻译阶段
+INITIAL = 'initial'
+BATCH = 'batch'
+REFLECT = 'reflect'
+IMPROVE = 'improve'
+REFLECT_BATCH = 'reflect_batch'
+IMPROVE_BATCH = 'improve_batch'
+
+_TRANSLATE_SYSTEM = (
+    "You are a automotive software localization expert. "
+    "Translate from {source_lang} to {target_lang} preserving: "
+    "1. Original formatting and punctuation\n"
+    "2. Industry terms (ECU, ABS, CAN, etc.)\n"
+    "3. Mixed language context\n\n"
+)
+
+_REFLECT_SYSTEM = {
+    "Chinese": "您是中国汽车行业的本地化专家，请用中文指出以下翻译问题：",
+    "Japanese": "自動車ソフトウェアの専門家として日本語でフィードバック：",
+    "English": "As automotive localization expert, provide English feedback:",
+    "default": "As automotive localization expert, provide English feedback:"
+}
+
+_IMPROVE_SYSTEM = {
+    "Chinese": "您是中国汽车行业的资深译员，请根据反馈改进翻译：",
+    "Japanese": "自動車分野のプロ翻訳者として改善してください：",
+    "English": "Refine this automotive translation per feedback:",
+    "default": "Refine this automotive translation per feedback:"
+}
+
+# 各阶段的 prompt 模板：system/user 按目标语言选择，缺省使用 default。
+# system 中的 {source_lang}/{target_lang} 在编译时替换，user 中的变量在调用时传入。
+PROMPT_TEMPLATES = {
+    INITIAL: {
+        'system': {'default': _TRANSLATE_SYSTEM + "Output ONLY the translated text."},
+        'user': {
+            "Chinese": "翻译到中文，保留英文术语：\n{input}",
+            "Japanese": "日本語に翻訳（アルファベット略語はそのまま）：\n{input}",
+            "English": "Translate to English preserving technical terms:\n{input}",
+            "default": "Translate:\n{input}"
+        }
+    },
+    BATCH: {
+        'system': {'default': _TRANSLATE_SYSTEM + (
+            "The input is a JSON object mapping segment IDs to texts. "
+            "Translate every value independently and keep every ID unchanged. "
+            "Output ONLY a JSON object with exactly the same IDs."
+        )},
+        'user': {'default': "{input}"}
+    },
+    REFLECT: {
+        'system': _REFLECT_SYSTEM,
+        'user': {'default': (
+            "请检查：\n"
+            "1. 术语一致性（ECU/ABS等是否保留）\n"
+            "2. 混合语言处理\n"
+            "3. 标点格式\n"
+            "4. 技术准确性\n\n"
+            "自动检查发现的问题：{issues}\n\n"
+            "原文：\n{source}\n\n"
+            "翻译内容：\n{translation}"
+        )}
+    },
+    IMPROVE: {
+        'system': _IMPROVE_SYSTEM,
+        'user': {'default': (
+            "反馈：\n{feedback}\n\n"
+            "改进要求：\n"
+            "1. 严格保留技术术语\n"
+            "2. 维持标点格式\n"
+            "3. 准确处理混合内容\n"
+            "4. 只输出改进后的译文\n\n"
+            "原文：\n{source}\n\n"
+            "待改进文本：\n{translation}"
+        )}
+    },
+    REFLECT_BATCH: {
+        'system': {lang: text + "\n"
+                   "The input is a JSON object mapping segment IDs to the source text, its translation and "
+                   "issues found by automatic checks. Check terminology (ECU/ABS etc.), mixed language, "
+                   "punctuation and technical accuracy. "
+                   "Output ONLY a JSON object mapping every ID to concise feedback."
+                   for lang, text in _REFLECT_SYSTEM.items()},
+        'user': {'default': "{input}"}
+    },
+    IMPROVE_BATCH: {
+        'system': {lang: text + "\n"
+                   "The input is a JSON object mapping segment IDs to the source text, its translation and "
+                   "review feedback. Strictly keep technical terms, punctuation and formatting. "
+                   "Output ONLY a JSON object mapping every ID to the improved translation."
+                   for lang, text in _IMPROVE_SYSTEM.items()},
+        'user': {'default': "{input}"}
+    },
+}
+
+# 模板版本：人工维护的 PROMPT_VERSION 加模板内容指纹，修改任何模板都会让旧的缓存键失效
+PROMPT_TEMPLATE_VERSION = f"{PROMPT_VERSION}-" + hashlib.sha1(
+    json.dumps(PROMPT_TEMPLATES, ensure_ascii=False, sort_keys=True).encode('utf-8')
+).hexdigest()[:8]
+
+
+def build_prompt(stage, source_lang, target_lang):
+    """根据阶段和语言对构建 ChatPromptTemplate"""
+    templates = PROMPT_TEMPLATES[stage]
+    system_prompt = templates['system'].get(target_lang, templates['system']['default'])
+    user_prompt = templates['user'].get(target_lang, templates['user']['default'])
+    return ChatPromptTemplate.from_messages([
+        ("system", system_prompt.format(source_lang=source_lang, target_lang=target_lang)),
+        ("user", user_prompt)
+    ])
+
+
+class PromptChainRegistry:
+    """按 (阶段, 源语言, 目标语言) 编译并复用 LCEL 链，避免每个片段重复构建 prompt 和链"""
+    def __init__(self, llm):
+        self.llm = llm
+        self._chains = {}
+        self._lock = threading.Lock()
+
+    def get(self, stage, source_lang, target_lang):
+        """获取已编译的链（首次使用时编译）"""
+        key = (stage, source_lang, target_lang)
+        chain = self._chains.get(key)
+        if chain is None:
+            with self._lock:
+                chain = self._chains.get(key)
+                if chain is None:
+                    chain = build_prompt(stage, source_lang, target_lang) | self.llm | StrOutputParser()
+                    self._chains[key] = chain
+                    logging.debug(f"Compiled prompt chain {key} ({PROMPT_TEMPLATE_VERSION})")
+        return chain
@@ -0,0 +1,69 @@
+import re
+import logging
+from gl_config import LOG_LEVEL, REFLECTION_MIN_LENGTH
+from pre_filter import NEEDS_TRANSLATION
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+# 各语言对译文/原文字符数比例的合理范围，超出范围视为异常
+LENGTH_RATIO_BOUNDS = {
+    ('English', 'Chinese'): (0.15, 1.0),
+    ('English', 'Japanese'): (0.2, 1.2),
+    ('Chinese', 'English'): (1.2, 6.0),
+    ('Japanese', 'English'): (0.8, 5.0),
+    ('Chinese', 'Japanese'): (0.7, 2.5),
+    ('Japanese', 'Chinese'): (0.4, 1.4),
+}
+DEFAULT_LENGTH_RATIO_BOUNDS = (0.2, 5.0)
+
+_NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+
+
+class ReflectionGate:
+    """
+    反思门控：用低成本的启发式检查筛选需要反思改进的片段。
+    只有被标记的片段才进入反思/改进流程，其余片段直接使用初译结果。
+    """
+    def __init__(self, acronym_manager, pre_filter):
+        self.pre_filter = pre_filter
+        # 行业缩写的整词匹配模式
+        abbreviations = sorted(acronym_manager.industry_abbreviations, key=len, reverse=True)
+        self.acronym_pattern = re.compile(r'(?<![A-Za-z0-9])(' + '|'.join(map(re.escape, abbreviations)) + r')(?![A-Za-z0-9])')
+
+    def check(self, source_text, translation, source_lang, target_lang):
+        """
+        检查初译结果
+        :return: 发现的问题列表，为空表示无需反思
+        """
+        reasons = []
+        source = source_text.strip()
+        translated = (translation or "").strip()
+        if not translated:
+            return ['empty translation']
+
+        # 译文与原文完全相同
+        if translated == source:
+            reasons.append('translation identical to source')
+
+        # 长度比例异常（短文本比例波动大，不做判断）
+        if len(source) >= REFLECTION_MIN_LENGTH:
+            low, high = LENGTH_RATIO_BOUNDS.get((source_lang, target_lang), DEFAULT_LENGTH_RATIO_BOUNDS)
+            ratio = len(translated) / len(source)
+            if ratio < low or ratio > high:
+                reasons.append(f'length ratio {ratio:.2f} outside [{low}, {high}]')
+
+        # 行业缩写丢失
+        lost_acronyms = set(self.acronym_pattern.findall(source)) - set(self.acronym_pattern.findall(translated))
+        if lost_acronyms:
+            reasons.append(f"lost acronyms: {', '.join(sorted(lost_acronyms))}")
+
+        # 数字丢失
+        lost_numbers = set(_NUMBER_RE.findall(source)) - set(_NUMBER_RE.findall(translated))
+        if lost_numbers:
+            reasons.append(f"lost numbers: {', '.join(sorted(lost_numbers))}")
+
+        # 译文仍不是目标语言文字
+        if self.pre_filter.classify(translated, target_lang, source_lang) == NEEDS_TRANSLATION:
+            reasons.append(f'translation is not in {target_lang} script')
+        return reasons
@@ -0,0 +1,136 @@
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from redis import Redis
+from redis.exceptions import RedisError
+from gl_config import LOG_LEVEL, REDIS_DB, REDIS_HOST, REDIS_PORT, REDIS_PASSWORD
+from gl_config import TASK_EVENTS_BACKEND, TASK_EVENTS_CACHE_SIZE
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+CHANNEL_PREFIX = 'task_events:'
+# 任务结束状态：推送后 SSE 连接关闭
+TERMINAL_STATES = ('SUCCESS', 'FAILURE')
+
+
+def task_channel(task_id):
+    """任务进度事件的 Redis pub/sub 频道名"""
+    return f"{CHANNEL_PREFIX}{task_id}"
+
+_publisher = None
+
+def _get_publisher():
+    global _publisher
+    if _publisher is None:
+        _publisher = Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, password=REDIS_PASSWORD)
+    return _publisher
+
+def publish_task_event(task_id, state, meta=None):
+    """
+    发布一条任务进度事件。
+    TASK_EVENTS_BACKEND 为 'redis' 时发布到 task_events:<task_id> 频道（worker 与 Web 进程跨进程推送），
+    为 'local' 时直接分发给本进程的订阅者（单进程或 eager 模式）。发布失败只记录日志，不影响翻译任务。
+    """
+    if task_id is None:
+        return
+    event = dict(meta or {}, state=state)
+    if TASK_EVENTS_BACKEND == 'local':
+        get_event_hub().dispatch(task_id, event)
+        return
+    try:
+        _get_publisher().publish(task_channel(task_id), json.dumps(event, ensure_ascii=False))
+    except RedisError as e:
+        logging.warning(f"发布任务进度事件失败: {e}")
+
+
+class TaskEventHub:
+    """
+    Web 进程内的任务事件中心。
+    - 只用一个后台线程按模式订阅 task_events:*，把事件分发到各 SSE 连接的本地队列，
+      连接数增加不会增加 Redis 读取
+    - 缓存每个任务的最新事件，新连接先收到当前状态
+    """
+    def __init__(self, backend=TASK_EVENTS_BACKEND, cache_size=TASK_EVENTS_CACHE_SIZE):
+        self.backend = backend
+        self.cache_size = cache_size
+        self._subscribers = {}  # {task_id: set(queue.Queue)}
+        self._last_events = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """启动 Redis 订阅线程（local 模式不需要）"""
+        if self.backend != 'redis' or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._listen, name="task-events", daemon=True)
+        self._thread.start()
+
+    def subscribe(self, task_id):
+        """为一个 SSE 连接注册本地队列"""
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(task_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, task_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(task_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[task_id]
+
+    def last_event(self, task_id):
+        """任务的最新事件，未收到过时返回 None"""
+        with self._lock:
+            return self._last_events.get(task_id)
+
+    def clear(self, task_id):
+        """丢弃任务的缓存事件（任务以同一 ID 重新提交时）"""
+        with self._lock:
+            self._last_events.pop(task_id, None)
+
+    def dispatch(self, task_id, event):
+        """缓存事件并放入该任务所有订阅者的队列"""
+        with self._lock:
+            self._last_events[task_id] = event
+            self._last_events.move_to_end(task_id)
+            while len(self._last_events) > self.cache_size:
+                self._last_events.popitem(last=False)
+            subscribers = list(self._subscribers.get(task_id, ()))
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    def _listen(self):
+        """订阅线程：断线后自动重连"""
+        while True:
+            try:
+                pubsub = Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, password=REDIS_PASSWORD).pubsub(
+                    ignore_subscribe_messages=True
+                )
+                pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                for message in pubsub.listen():
+                    channel = message['channel'].decode('utf-8')
+                    self.dispatch(channel[len(CHANNEL_PREFIX):], json.loads(message['data']))
+            except (RedisError, ValueError) as e:
+                logging.warning(f"任务事件订阅中断，5 秒后重连: {e}")
+                time.sleep(5)
+
+
+_event_hub = None
+_event_hub_lock = threading.Lock()
+
+def get_event_hub():
+    """获取当前进程的 TaskEventHub 单例（首次获取时启动订阅线程）"""
+    global _event_hub
+    if _event_hub is None:
+        with _event_hub_lock:
+            if _event_hub is None:
+                hub = TaskEventHub()
+                hub.start()
+                _event_hub = hub
+    return _event_hub
@@ -1,11 +1,23 @@
-from celery import Celery
+from celery import Celery, chord
+from celery.exceptions import Ignore
+from celery.signals import worker_process_init, worker_process_shutdown, before_task_publish, task_prerun, task_postrun
+from kombu import Queue
 from translator import Translator
+from fanout import collect_file_segments, chunk_segments, PresetTranslationCore
+from checkpoint_store import get_checkpoint_store, JOB_DONE, JOB_FAILED
+from feedback_store import get_feedback_store
+from task_events import publish_task_event, TERMINAL_STATES
 import logging
+import math
 import os
+import threading
+import time
 from redis import Redis
 from redis.exceptions import ConnectionError
-from gl_config import REDIS_DB, REDIS_HOST, REDIS_PORT
-from gl_config import LOG_LEVEL
+from gl_config import REDIS_DB, REDIS_HOST, REDIS_PORT, REDIS_PASSWORD
+from gl_config import LOG_LEVEL, FANOUT_ENABLED, FANOUT_MIN_SEGMENTS, FANOUT_CHUNK_SEGMENTS, CHECKPOINT_ENABLED
+from gl_config import BROKER_VISIBILITY_TIMEOUT, CHECKPOINT_LEASE_SECONDS
+from gl_config import TEXT_QUEUE, FILE_QUEUE, QUEUE_WAIT_SAMPLES
 
 # 配置日志记录
 logging.basicConfig(level=LOG_LEVEL)
@@ -14,18 +26,222 @@ app = Celery('task_manager',
              broker=f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}',
              backend=f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}')
 
+# 队列路由：文本翻译走低延迟队列，文件翻译（含分发子任务）走批量队列
+app.conf.task_queues = (Queue(TEXT_QUEUE), Queue(FILE_QUEUE))
+app.conf.task_default_queue = FILE_QUEUE
+app.conf.task_routes = {
+    'task_manager.translate_texts': {'queue': TEXT_QUEUE},
+    'task_manager.stream_texts': {'queue': TEXT_QUEUE},
+    'task_manager.translate_file': {'queue': FILE_QUEUE},
+    'task_manager.translate_segments': {'queue': FILE_QUEUE},
+    'task_manager.merge_translations': {'queue': FILE_QUEUE},
+}
+# 同时消费两个队列的 worker 按 task_queues 顺序取任务（文本队列优先）
+app.conf.broker_transport_options = {'queue_order_strategy': 'priority'}
+# 每个 worker 进程只预取一条消息，空闲 worker 不会提前占住排队中的文件任务
+app.conf.worker_prefetch_multiplier = 1
+# acks_late 的文件任务在确认前超过该时长会被重新投递，必须大于最长任务耗时，否则长任务会并发执行两次
+app.conf.broker_transport_options['visibility_timeout'] = BROKER_VISIBILITY_TIMEOUT
+
 class TranslationError(Exception):
     """自定义翻译异常类"""
     pass
 
-@app.task(bind=True)
+# 每个 worker 进程只创建一次 Translator（含 TranslationCore、ChatOpenAI 客户端和 HTTP 连接池）
+_translator = None
+_translator_init_seconds = None
+
+def get_translator():
+    """获取当前 worker 进程的 Translator 单例"""
+    global _translator, _translator_init_seconds
+    if _translator is None:
+        start = time.perf_counter()
+        _translator = Translator()
+        _translator_init_seconds = time.perf_counter() - start
+        logging.info(f"Translator initialized in {_translator_init_seconds:.3f}s (pid {os.getpid()})")
+    return _translator
+
+@worker_process_init.connect
+def init_worker_translator(**kwargs):
+    """prefork 子进程启动时预先创建 Translator（solo 池在首个任务时懒加载）"""
+    get_translator()
+
+@task_postrun.connect
+def flush_feedback(**kwargs):
+    """每个任务结束时把缓冲的翻译反馈写入数据库，Web 端 /feedback 立即可见"""
+    get_feedback_store().flush()
+
+@worker_process_shutdown.connect
+def flush_feedback_on_shutdown(**kwargs):
+    """prefork 子进程通过 os._exit 退出，atexit 不会执行，回收前显式写入剩余反馈"""
+    get_feedback_store().flush()
+
+def _acquire_translator():
+    """获取 Translator 并返回本次任务的准备耗时（秒）"""
+    start = time.perf_counter()
+    translator = get_translator()
+    setup_seconds = time.perf_counter() - start
+    logging.info(f"Task setup took {setup_seconds * 1000:.1f}ms (translator init {_translator_init_seconds:.3f}s)")
+    return translator, setup_seconds
+
+_redis = None
+
+def get_redis():
+    """获取当前进程的 Redis 客户端（用于跨子任务的进度汇总和排队耗时统计）"""
+    global _redis
+    if _redis is None:
+        _redis = Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, password=REDIS_PASSWORD)
+    return _redis
+
+def _queue_wait_key(queue):
+    return f"queue_wait:{queue}"
+
+@before_task_publish.connect
+def stamp_enqueue_time(headers=None, routing_key=None, **kwargs):
+    """发布任务时在消息头中记录入队时间和队列名"""
+    if headers is not None:
+        headers['enqueued_at'] = time.time()
+        headers['enqueued_queue'] = routing_key
+
+@task_prerun.connect
+def record_queue_wait(task_id=None, task=None, **kwargs):
+    """任务开始执行时计算排队耗时，写入该队列最近的样本列表"""
+    enqueued_at = task.request.get('enqueued_at')
+    if enqueued_at is None:
+        return  # eager 模式或旧消息
+    wait_ms = (time.time() - enqueued_at) * 1000
+    queue = task.request.get('enqueued_queue') or (task.request.delivery_info or {}).get('routing_key')
+    logging.info(f"Task {task.name}[{task_id}] waited {wait_ms:.1f}ms in queue '{queue}'")
+    try:
+        key = _queue_wait_key(queue)
+        pipe = get_redis().pipeline()
+        pipe.lpush(key, round(wait_ms, 1))
+        pipe.ltrim(key, 0, QUEUE_WAIT_SAMPLES - 1)
+        pipe.execute()
+    except ConnectionError as e:
+        logging.warning(f"记录排队耗时失败: {e}")
+
+@task_postrun.connect
+def publish_final_state(task_id=None, retval=None, state=None, **kwargs):
+    """任务结束时推送最终状态（被 chord 替换的任务不推送，由汇总任务以同一 ID 推送）"""
+    if state not in TERMINAL_STATES:
+        return
+    if state == 'SUCCESS':
+        meta = dict(retval) if isinstance(retval, dict) else {}
+        meta.setdefault('progress', 100.0)
+    else:
+        meta = {'error': str(retval)}
+    publish_task_event(task_id, state, meta)
+
+def _percentile(sorted_values, percent):
+    """最近秩法百分位数"""
+    rank = math.ceil(percent / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+def get_queue_wait_stats():
+    """
+    各队列最近 QUEUE_WAIT_SAMPLES 个任务的排队耗时统计（毫秒）
+    :return: {队列名: {'samples', 'p50_ms', 'p99_ms', 'max_ms'}}
+    """
+    stats = {}
+    for queue in (TEXT_QUEUE, FILE_QUEUE):
+        samples = sorted(float(value) for value in get_redis().lrange(_queue_wait_key(queue), 0, -1))
+        stats[queue] = {
+            'samples': len(samples),
+            'p50_ms': _percentile(samples, 50) if samples else None,
+            'p99_ms': _percentile(samples, 99) if samples else None,
+            'max_ms': samples[-1] if samples else None
+        }
+    return stats
+
+def _fanout_progress_key(parent_id):
+    return f"fanout_progress:{parent_id}"
+
+def _report_fanout_progress(parent_id, delta, total):
+    """子任务完成的片段数累加到 Redis 计数器，并以父任务 ID 写入汇总进度"""
+    key = _fanout_progress_key(parent_id)
+    current = min(get_redis().incrby(key, delta), total)
+    get_redis().expire(key, 24 * 3600)
+    meta = {
+        'current': current,
+        'total': total,
+        'progress': round(current / total * 100, 1) if total else 100.0
+    }
+    app.backend.store_result(parent_id, meta, 'PROGRESS')
+    publish_task_event(parent_id, 'PROGRESS', meta)
+
+def _register_checkpoint_job(task, file_path, output_path, source_lang, target_lang):
+    """登记任务检查点（重试或重新提交时沿用同一任务 ID，已保存的片段不再翻译）"""
+    if CHECKPOINT_ENABLED and task.request.id is not None:
+        get_checkpoint_store().register_job(task.request.id, file_path, output_path, source_lang, target_lang)
+
+def _start_lease_heartbeat(job_id):
+    """
+    任务执行期间由后台线程定期续租检查点租约；worker 崩溃后不再续租，租约过期，/resume 才允许重新提交
+    :return: 停止续租的 Event（任务结束时 set）
+    """
+    stop = threading.Event()
+    if not CHECKPOINT_ENABLED or job_id is None:
+        return stop
+    store = get_checkpoint_store()
+    store.renew_lease(job_id)
+
+    def heartbeat():
+        while not stop.wait(CHECKPOINT_LEASE_SECONDS / 3):
+            store.renew_lease(job_id)
+
+    threading.Thread(target=heartbeat, name="checkpoint-lease", daemon=True).start()
+    return stop
+
+def _finish_checkpoint_job(task_id, status):
+    """
+    更新任务检查点状态
+    :return: 本次运行从检查点恢复的片段数
+    """
+    if not CHECKPOINT_ENABLED or task_id is None:
+        return 0
+    store = get_checkpoint_store()
+    job = store.get_job(task_id)
+    store.set_status(task_id, status)
+    return job['recovered'] if job else 0
+
+def _fan_out(task, file_path, output_path, source_lang, target_lang):
+    """
+    片段级分发：收集文件中的唯一片段，分块交给所有 worker 并发翻译，
+    由 chord 回调 merge_translations 写出译文文件。
+    替换后当前任务以 Ignore 结束（eager 模式下直接返回汇总结果）；片段数不足阈值时返回 None，按单任务翻译。
+    """
+    segments = collect_file_segments(Translator, file_path, source_lang, target_lang)
+    if len(segments) < FANOUT_MIN_SEGMENTS:
+        return None
+    chunks = chunk_segments(segments, FANOUT_CHUNK_SEGMENTS)
+    logging.info(f"Fanning out {len(segments)} segments of {file_path} as {len(chunks)} subtasks")
+    get_redis().delete(_fanout_progress_key(task.request.id))
+    if CHECKPOINT_ENABLED:
+        # 子任务在队列中等待期间没有 worker 续租；排队中丢失的消息由 broker 在可见性超时内重新投递，
+        # 在此之前不认为任务已中断
+        get_checkpoint_store().renew_lease(task.request.id, BROKER_VISIBILITY_TIMEOUT)
+    header = [translate_segments.s(chunk, source_lang, target_lang, task.request.id, len(segments))
+              for chunk in chunks]
+    # 用 chord 替换当前任务：回调继承当前任务 ID，前端继续按原 task_id 查询进度和结果
+    return task.replace(chord(header, merge_translations.s(file_path, output_path, source_lang, target_lang)))
+
+@app.task(bind=True, acks_late=True, reject_on_worker_lost=True)
 def translate_file(self, file_path, output_path, source_lang, target_lang):
     """
     文件翻译任务
+    acks_late + reject_on_worker_lost：worker 中途退出时任务重新入队，按检查点从断点继续
     """
     logging.info(f"Starting translation for file: {file_path}")
-    translator = Translator()
+    translator, setup_seconds = _acquire_translator()
+    _register_checkpoint_job(self, file_path, output_path, source_lang, target_lang)
+    lease = _start_lease_heartbeat(self.request.id)
     try:
+        if FANOUT_ENABLED and self.request.id is not None:
+            fan_out_result = _fan_out(self, file_path, output_path, source_lang, target_lang)
+            if fan_out_result is not None:
+                return fan_out_result
+
         logging.info(f"Initializing translation for file: {file_path}")
         translator.translate_file(file_path, output_path, source_lang, target_lang, self)
         logging.info(f"Translation completed for file: {file_path}")
@@ -34,11 +250,17 @@ def translate_file(self, file_path, output_path, source_lang, target_lang):
             'current': 1,
             'total': 1,
             'progress': 100.0,
-            'translated_file_path': output_path
+            'translated_file_path': output_path,
+            'setup_seconds': setup_seconds,
+            'recovered_segments': _finish_checkpoint_job(self.request.id, JOB_DONE)
         }
-        
+
+    except Ignore:
+        # 任务已被 chord 替换
+        raise
     except Exception as e:
         logging.error(f"Error during translation for file {file_path}: {str(e)}")
+        _finish_checkpoint_job(self.request.id, JOB_FAILED)
         error = TranslationError(f"Translation failed: {str(e)}")
         self.update_state(
             state='FAILURE',
@@ -49,14 +271,111 @@ def translate_file(self, file_path, output_path, source_lang, target_lang):
             }
         )
         raise error
+    finally:
+        lease.set()
 
 
+@app.task(bind=True)
+def translate_segments(self, segments, source_lang, target_lang, parent_id, total):
+    """
+    分发子任务：翻译一块片段，返回 {原文: 译文}
+    :param parent_id: 原文件翻译任务 ID（进度汇总和反馈日志使用）
+    :param total: 整个文件的片段总数
+    """
+    translator, _ = _acquire_translator()
+    translation_core = translator.translation_core
+    done = [0]
+
+    def on_progress(current, _chunk_total):
+        delta = current - done[0]
+        done[0] = current
+        if delta:
+            _report_fanout_progress(parent_id, delta, total)
+
+    translation_core.job_id = parent_id
+    lease = _start_lease_heartbeat(parent_id)
+    try:
+        return translation_core.translate_unique(
+            segments, source_lang, target_lang, progress_callback=on_progress, fallback_on_error=True
+        )
+    finally:
+        lease.set()
+        translation_core.job_id = None
+
+@app.task(bind=True)
+def merge_translations(self, results, file_path, output_path, source_lang, target_lang):
+    """
+    分发汇总任务（chord 回调，任务 ID 与原文件翻译任务相同）：
+    用子任务的译文写出翻译后的文件，缺失的片段由本 worker 补译
+    """
+    translations = {}
+    for result in results:
+        translations.update(result)
+    logging.info(f"Merging {len(translations)} translated segments into {output_path}")
+    translator, setup_seconds = _acquire_translator()
+    lease = _start_lease_heartbeat(self.request.id)
+    try:
+        Translator(PresetTranslationCore(translator.translation_core, translations)).translate_file(
+            file_path, output_path, source_lang, target_lang, self
+        )
+        return {
+            'current': 1,
+            'total': 1,
+            'progress': 100.0,
+            'translated_file_path': output_path,
+            'setup_seconds': setup_seconds,
+            'recovered_segments': _finish_checkpoint_job(self.request.id, JOB_DONE)
+        }
+    except Exception as e:
+        # 与 translate_file 相同的失败处理：前端看到的错误结构一致
+        logging.error(f"Error during merge for file {file_path}: {str(e)}")
+        _finish_checkpoint_job(self.request.id, JOB_FAILED)
+        error = TranslationError(f"Translation failed: {str(e)}")
+        self.update_state(
+            state='FAILURE',
+            meta={
+                'exc_type': type(error).__name__,
+                'exc_message': str(error),
+                'error': str(error)
+            }
+        )
+        raise error
+    finally:
+        lease.set()
+        get_redis().delete(_fanout_progress_key(self.request.id))
+
 @app.task(bind=True)
 def translate_texts(self, text, source_lang, target_lang):
     try:
-        translator = Translator()
-        translator.translate_text(text, source_lang, target_lang, self)
+        translator, setup_seconds = _acquire_translator()
+        translate_result = translator.translate_text(text, source_lang, target_lang, self)
+        return {
+            'translate_result': translate_result,
+            'setup_seconds': setup_seconds
+        }
     except Exception as e:
         logging.error(f"Error during translation for {text}: {str(e)}")
         error = TranslationError(f"Translation failed: {str(e)}")
         raise error
+
+@app.task(bind=True)
+def stream_texts(self, text, source_lang, target_lang):
+    """
+    流式文字翻译任务：模型每产出一个 token 就在 task_events 频道发布一条 STREAMING 事件，
+    Web 进程只转发这些事件；事件同时带上已生成的全部译文，晚连接的客户端也能补齐。
+    最终结果由 task_postrun 以 SUCCESS/FAILURE 事件推送
+    """
+    try:
+        translator, setup_seconds = _acquire_translator()
+        tokens = []
+        for token in translator.translation_core.stream_text(text, source_lang, target_lang):
+            tokens.append(token)
+            publish_task_event(self.request.id, 'STREAMING', {'token': token, 'text': "".join(tokens)})
+        return {
+            'translate_result': "".join(tokens),
+            'setup_seconds': setup_seconds
+        }
+    except Exception as e:
+        logging.error(f"Error during streaming translation for {text}: {str(e)}")
+        error = TranslationError(f"Translation failed: {str(e)}")
+        raise error
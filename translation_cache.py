@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from gl_config import LOG_LEVEL, CACHE_DB_PATH, CACHE_MAX_ENTRIES
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+
+def normalize_text(text):
+    """缓存键使用的文本规范化（NFC + 去除首尾空白 + 合并连续空白）"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class TranslationCache:
+    """
+    基于 SQLite 的本地持久化翻译缓存。
+    - 所有 Celery worker 共享同一个数据库文件（WAL 模式，支持多进程并发读写）
+    - 按最近访问时间做 LRU 淘汰，条目数超过 max_entries 时删除最久未使用的部分
+    - 统计命中/未命中次数
+    """
+    def __init__(self, db_path=CACHE_DB_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " source_text TEXT NOT NULL,"
+            " translated_text TEXT NOT NULL,"
+            " source_lang TEXT, target_lang TEXT, model_name TEXT,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " hit_count INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_access ON translations(last_access)")
+        conn.commit()
+
+    def _connection(self):
+        """每个线程使用独立连接（sqlite3 连接不能跨线程共享）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(text, source_lang, target_lang, model_name, temperature, prompt_version):
+        """由规范化文本、语言对、模型、温度和 prompt 版本生成缓存键"""
+        raw = "\x1f".join([
+            normalize_text(text), str(source_lang), str(target_lang),
+            str(model_name), str(temperature), str(prompt_version)
+        ])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """查询缓存，命中时刷新访问时间"""
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT translated_text FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                with self._stats_lock:
+                    self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE translations SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+                (time.time(), key)
+            )
+            conn.commit()
+            with self._stats_lock:
+                self.hits += 1
+            return row[0]
+        except sqlite3.Error as e:
+            logging.warning(f"翻译缓存读取失败: {e}")
+            with self._stats_lock:
+                self.misses += 1
+            return None
+
+    def set(self, key, source_text, translated_text, source_lang, target_lang, model_name):
+        """写入缓存，并在超出容量时执行 LRU 淘汰"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO translations"
+                " (key, source_text, translated_text, source_lang, target_lang, model_name, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, source_text, translated_text, source_lang, target_lang, model_name, now, now)
+            )
+            conn.commit()
+            self._evict_if_needed(conn)
+        except sqlite3.Error as e:
+            logging.warning(f"翻译缓存写入失败: {e}")
+
+    def _evict_if_needed(self, conn):
+        """条目数超过上限时，删除最久未访问的 10%（每写入 100 次检查一次，避免频繁 COUNT）"""
+        self._writes += 1
+        if not self.max_entries or self._writes % 100 != 1:
+            return
+        count = conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        to_delete = count - self.max_entries + max(1, self.max_entries // 10)
+        conn.execute(
+            "DELETE FROM translations WHERE key IN"
+            " (SELECT key FROM translations ORDER BY last_access ASC LIMIT ?)",
+            (to_delete,)
+        )
+        conn.commit()
+        logging.info(f"翻译缓存淘汰 {to_delete} 条记录")
+
+    def stats(self):
+        """返回缓存统计信息（hits/misses 为当前进程计数，total_hits 为所有 worker 的累计命中）"""
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        info = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+        }
+        try:
+            entries, total_hits = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(hit_count), 0) FROM translations"
+            ).fetchone()
+            info.update({'entries': entries, 'total_hits': total_hits})
+        except sqlite3.Error as e:
+            logging.warning(f"翻译缓存统计失败: {e}")
+        return info
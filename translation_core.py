@@ -1,16 +1,24 @@
 from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema import StrOutputParser
-import re
 import logging
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 from acronym_manager import AcronymManager
 import os
-import datetime
-import csv
-from langdetect import detect, LangDetectException
+import json
+from pre_filter import PreTranslationFilter, NEEDS_TRANSLATION, TARGET_LANGUAGE, TECHNICAL
 
 # 导入配置文件
-from gl_config import LOG_LEVEL, MODEL_NAME, ENDPOINT_URL, TEMPERATURE, MAX_RETRY, USE_REFLECTION, API_KEY
+from gl_config import LOG_LEVEL, MODEL_NAME, ENDPOINT_URL, TEMPERATURE, USE_REFLECTION, API_KEY
+from gl_config import CACHE_ENABLED, BATCH_MAX_CHARS, BATCH_MAX_SEGMENTS, MAX_CONCURRENCY
+from gl_config import HTTP_MAX_CONNECTIONS, CHECKPOINT_ENABLED
+from translation_cache import TranslationCache
+from checkpoint_store import get_checkpoint_store
+from feedback_store import get_feedback_store
+from reflection_gate import ReflectionGate
+from prompt_registry import PromptChainRegistry, PROMPT_TEMPLATE_VERSION
+from prompt_registry import INITIAL, BATCH, REFLECT, IMPROVE, REFLECT_BATCH, IMPROVE_BATCH
 
 # 配置日志记录
 logging.basicConfig(level=LOG_LEVEL)
@@ -33,216 +41,451 @@ class TranslationCore:
         # Some OpenAI-compatible clients require a non-empty api_key value even for local endpoints
         # If API_KEY is not provided, set a harmless placeholder so client initialization succeeds.
         api_key_to_use = API_KEY if API_KEY is not None else (os.environ.get("OPENAI_API_KEY") or "ollama-local")
-        self.llm = ChatOpenAI(model=model_name, base_url=endpoint_url, api_key=api_key_to_use, temperature=temperature)
+        # 使用带 keep-alive 连接池的 HTTP 客户端，TranslationCore 复用期间连接不重复建立
+        limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS)
+        self.llm = ChatOpenAI(
+            model=model_name, base_url=endpoint_url, api_key=api_key_to_use, temperature=temperature,
+            http_client=httpx.Client(limits=limits),
+            http_async_client=httpx.AsyncClient(limits=limits)
+        )
+        self.model_name = model_name
+        # 按 (阶段, 语言对) 预编译并复用的 prompt 链
+        self.prompts = PromptChainRegistry(self.llm)
+        self.temperature = temperature
+
+        # 当前翻译任务 ID（记录到翻译反馈日志）
+        self.job_id = None
+
+        # 异步翻译引擎的事件循环（首次使用时在后台线程中启动，异步连接池绑定在该循环上）
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        # 在途请求上限（在事件循环线程中创建，所有调用方共享，如 Excel 并发的各工作表）
+        self._semaphore = None
+        # 存储线程：缓存/检查点/反馈的同步 SQLite 写入按顺序在此执行，不占用事件循环
+        self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="translation-store")
+
+        # 持久化翻译缓存（所有 worker 共享）
+        self.cache = TranslationCache() if CACHE_ENABLED else None
+        # 任务检查点（按任务 ID 保存已完成片段，重试的任务从断点继续）
+        self.checkpoints = get_checkpoint_store() if CHECKPOINT_ENABLED else None
         
         self.acronym_manager = AcronymManager()
-
-        # 配置语言检测映射
-        self.lang_code_map = {
-            'Chinese': 'zh',
-            'Japanese': 'ja',
-            'English': 'en'
-        }
+        # 前置检查分类器（预编译模式，确定性结果）
+        self.pre_filter = PreTranslationFilter(self.acronym_manager)
+        # 反思门控（USE_REFLECTION 开启时只对可疑片段做反思改进）
+        self.reflection_gate = ReflectionGate(self.acronym_manager, self.pre_filter)
         
     def translate_text(self, text, source_lang, target_lang, use_reflection=USE_REFLECTION):
         """核心翻译方法"""
         original_text = text
 
         # 前置检查流程
-        check_result = self._pre_translation_checks(original_text, target_lang)
+        check_result = self._pre_translation_checks(original_text, target_lang, source_lang)
         if check_result is not None:
-            #翻译前后内容记录到logfiles下translation_feedback.csv文件中
-            self._log_translation_feedback(original_text, check_result)
+            #翻译前后内容记录到翻译反馈日志中
+            self._log_translation_feedback(original_text, check_result, source_lang, target_lang, 'kept')
             return check_result
 
+        # 缓存查询
+        cache_key = self._cache_key(original_text, source_lang, target_lang, use_reflection)
+        if self.cache is not None:
+            cached_result = self.cache.get(cache_key)
+            if cached_result is not None:
+                logging.debug(f"翻译缓存命中: {original_text}")
+                self._log_translation_feedback(original_text, cached_result, source_lang, target_lang, 'cached')
+                return cached_result
 
         # 翻译流程
         initial_result = self.initial_translation_with_lang(original_text, source_lang, target_lang)
-        
         if use_reflection:
-            feedback_result = self.reflect_translation(initial_result, target_lang)
-            finally_result = self.improve_translation(initial_result, feedback_result, target_lang)
+            finally_result = self._reflect_if_needed(original_text, initial_result, source_lang, target_lang)
         else:
             finally_result = initial_result
+        return self._finish_translation(original_text, initial_result, finally_result, cache_key, source_lang, target_lang)
+
+    def stream_text(self, text, source_lang, target_lang, use_reflection=USE_REFLECTION):
+        """
+        流式翻译：LLM 每产出一个 token 就 yield 一次。
+        前置检查和缓存命中时一次性产出完整结果；开启反思流程时无法流式输出，直接产出最终结果。
+        """
+        check_result = self._pre_translation_checks(text, target_lang, source_lang)
+        if check_result is not None or use_reflection:
+            yield self.translate_text(text, source_lang, target_lang, use_reflection)
+            return
+
+        cache_key = self._cache_key(text, source_lang, target_lang, use_reflection)
+        if self.cache is not None:
+            cached_result = self.cache.get(cache_key)
+            if cached_result is not None:
+                self._log_translation_feedback(text, cached_result, source_lang, target_lang, 'cached')
+                yield cached_result
+                return
+
+        tokens = []
+        for token in self.prompts.get(INITIAL, source_lang, target_lang).stream({"input": text}):
+            tokens.append(token)
+            yield token
+        result = "".join(tokens)
+        self._finish_translation(text, result, result, cache_key, source_lang, target_lang)
+
+    def translate_unique(self, texts, source_lang, target_lang, progress_callback=None, fallback_on_error=False):
+        """
+        文档级去重翻译：只翻译去重后的文本集合。
+        :param texts: 文档中收集到的全部待翻译文本（可重复）
+        :param progress_callback: 进度回调 callback(done, total)，按唯一文本计数
+        :param fallback_on_error: 为 True 时单条翻译出错返回原文，否则抛出异常
+        :return: {原文: 译文} 映射
+        """
+        unique_texts = list(dict.fromkeys(text for text in texts if text and text.strip()))
+        logging.info(f"去重翻译: 共 {len(texts)} 个片段，唯一文本 {len(unique_texts)} 个")
+
+        results = self.translate_batch(
+            unique_texts, source_lang, target_lang,
+            progress_callback=progress_callback,
+            fallback_on_error=fallback_on_error
+        )
+        return dict(zip(unique_texts, results))
+
+    def translate_batch(self, texts, source_lang, target_lang, use_reflection=USE_REFLECTION,
+                        progress_callback=None, fallback_on_error=False):
+        """
+        多段批量翻译：把多个片段打包进一次请求，返回与 texts 顺序一致的译文列表。
+        前置检查和缓存命中的片段不进入请求；批量回复格式错误或缺少片段时逐段重试。
+        :param progress_callback: 进度回调 callback(done, total)
+        :param fallback_on_error: 为 True 时单条翻译出错返回原文，否则抛出异常
+        """
+        total = len(texts)
+        results = [None] * total
+        pending = []  # (索引, 原文, 缓存键)
+
+        # 前置检查（批量分类）与缓存查询
+        labels = self.pre_filter.classify_batch(texts, target_lang, source_lang)
+        for idx, (text, label) in enumerate(zip(texts, labels)):
+            check_result = self._pre_translation_checks(text, target_lang, source_lang, label)
+            if check_result is not None:
+                self._log_translation_feedback(text, check_result, source_lang, target_lang, 'kept')
+                results[idx] = check_result
+                continue
+            cache_key = self._cache_key(text, source_lang, target_lang, use_reflection)
+            cached_result = self.cache.get(cache_key) if self.cache is not None else None
+            if cached_result is not None:
+                self._log_translation_feedback(text, cached_result, source_lang, target_lang, 'cached')
+                results[idx] = cached_result
+                continue
+            pending.append((idx, text, cache_key))
+
+        # 从任务检查点恢复已完成的片段（重试或重新提交的任务）
+        pending = self._restore_checkpoints(pending, results, source_lang, target_lang)
 
+        done = total - len(pending)
+        if progress_callback is not None and done:
+            progress_callback(done, total)
+
+        # 按字符预算打包请求，并发发送
+        batches = list(self._pack_batches(pending))
+        if batches:
+            self._run_async(self._run_batches(
+                batches, results, done, total, source_lang, target_lang,
+                use_reflection, progress_callback, fallback_on_error
+            ))
+        return results
+
+    def _run_async(self, coro):
+        """在核心专属的事件循环线程中执行协程并等待结果"""
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="translation-engine", daemon=True).start()
+                    self._loop = loop
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _run_batches(self, batches, results, done, total, source_lang, target_lang,
+                           use_reflection, progress_callback, fallback_on_error):
+        """
+        异步并发翻译引擎：结果按原索引写回。
+        并发调用共用核心级信号量，整个核心最多 MAX_CONCURRENCY 个请求同时在途
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        semaphore = self._semaphore
+        progress = [done]
+
+        async def run_batch(batch):
+            async with semaphore:
+                translated = await self._atranslate_packed([text for _, text, _ in batch], source_lang, target_lang)
+                initial_results = {}
+                for (idx, text, cache_key), initial_result in zip(batch, translated):
+                    try:
+                        if initial_result is None:
+                            # 批量结果缺失，逐段重试
+                            initial_result = await self.ainitial_translation_with_lang(text, source_lang, target_lang)
+                        initial_results[idx] = initial_result
+                    except Exception as e:
+                        if not fallback_on_error:
+                            raise
+                        logging.error(f"Translation error for '{text}': {str(e)}")
+                        results[idx] = text  # 出错时返回原值
+
+                # 反思门控：只对被标记的片段批量反思改进
+                final_results = dict(initial_results)
+                if use_reflection and initial_results:
+                    flagged = []
+                    for idx, text, _ in batch:
+                        if idx not in initial_results:
+                            continue
+                        reasons = self.reflection_gate.check(text, initial_results[idx], source_lang, target_lang)
+                        if reasons:
+                            flagged.append((idx, text, reasons))
+                    logging.info(f"反思门控: {len(flagged)}/{len(initial_results)} 个片段需要反思改进")
+                    if flagged:
+                        improved = await self._areflect_batch(
+                            [(text, initial_results[idx], reasons) for idx, text, reasons in flagged],
+                            source_lang, target_lang
+                        )
+                        for (idx, _, _), improved_result in zip(flagged, improved):
+                            if improved_result:
+                                final_results[idx] = improved_result
+
+                finished = []
+                for idx, text, cache_key in batch:
+                    if idx in initial_results:
+                        results[idx] = final_results[idx]
+                        finished.append((text, initial_results[idx], final_results[idx], cache_key))
+
+            # 缓存、检查点和反馈日志是同步 SQLite 写入，释放信号量后交给存储线程执行，不阻塞事件循环
+            if finished:
+                await asyncio.get_running_loop().run_in_executor(
+                    self._store_executor, self._store_batch, finished, source_lang, target_lang
+                )
+            progress[0] += len(batch)
+            if progress_callback is not None:
+                progress_callback(progress[0], total)
+
+        await asyncio.gather(*(run_batch(batch) for batch in batches))
+
+    def _store_batch(self, finished, source_lang, target_lang):
+        """
+        写入一批已完成片段的日志、缓存和检查点（在存储线程中执行）
+        :param finished: [(原文, 初译, 最终译文, 缓存键)]
+        """
+        for text, initial_result, finally_result, cache_key in finished:
+            self._finish_translation(text, initial_result, finally_result, cache_key, source_lang, target_lang)
+        self._save_checkpoints(
+            [(text, finally_result) for text, _, finally_result, _ in finished], source_lang, target_lang
+        )
+
+    def _finish_translation(self, original_text, initial_result, finally_result, cache_key, source_lang, target_lang):
+        """翻译完成后的日志记录和缓存写入"""
         logging.info(f"{original_text} → {initial_result} → {finally_result} Translating from {source_lang} to {target_lang}")
-        self._log_translation_feedback(original_text, check_result)
+        self._log_translation_feedback(original_text, finally_result, source_lang, target_lang, 'translated')
+        if self.cache is not None:
+            self.cache.set(cache_key, original_text, finally_result, source_lang, target_lang, self.model_name)
         return finally_result
-    
-    def _log_translation_feedback(self, original_text, check_result):
-        import os
-        # 确保 logfiles 目录存在
-        log_dir = 'logfiles'
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-        
-        # 打开日志文件并写入反馈信息
-        with open(os.path.join(log_dir, 'translation_feedback.csv'), 'a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow([original_text, check_result])
 
-    
-    
-    def _pre_translation_checks(self, text, target_lang):
-        """执行所有前置检查的集成方法"""
-        # 空值检查
-        if not text or text.strip() == "":
-            return text
-        
-        # 技术内容检查（包含最新特殊字符）
-        if self._is_technical_content(text):
-            logging.debug(f"技术内容保留: {text}")
-            return text
-            
-        # 目标语言验证（增强版）
-        if self._is_effective_target_language(text, target_lang):
-            logging.info(f"目标语言内容保留: {text}")
-            return text
-            
-        # 单字符/无效输入检查
-        if not self._is_translatable(text):
-            return text
-            
-        return None
+    def _restore_checkpoints(self, pending, results, source_lang, target_lang):
+        """
+        从当前任务的检查点中取回已翻译的片段，写入 results
+        :return: 仍需翻译的片段列表
+        """
+        if self.checkpoints is None or self.job_id is None or not pending:
+            return pending
+        segment_ids = {idx: self.checkpoints.segment_id(text, source_lang, target_lang) for idx, text, _ in pending}
+        saved = self.checkpoints.load(self.job_id, segment_ids.values())
+        if not saved:
+            return pending
+        remaining = []
+        for item in pending:
+            idx, text, _ = item
+            translated = saved.get(segment_ids[idx])
+            if translated is None:
+                remaining.append(item)
+                continue
+            self._log_translation_feedback(text, translated, source_lang, target_lang, 'checkpoint')
+            results[idx] = translated
+        recovered = len(pending) - len(remaining)
+        self.checkpoints.add_recovered(self.job_id, recovered)
+        logging.info(f"从检查点恢复 {recovered} 个片段 (job {self.job_id})")
+        return remaining
 
+    def _save_checkpoints(self, items, source_lang, target_lang):
+        """保存一批已完成片段的译文到当前任务的检查点"""
+        if self.checkpoints is None or self.job_id is None or not items:
+            return
+        self.checkpoints.save(self.job_id, [
+            (self.checkpoints.segment_id(text, source_lang, target_lang), translated) for text, translated in items
+        ])
 
-    def _is_effective_target_language(self, text, target_lang):
-        """增强版语言有效性检测"""
+    def _reflect_if_needed(self, source_text, translation, source_lang, target_lang):
+        """单段反思流程：门控检查通过时直接返回初译，否则反思并改进"""
+        reasons = self.reflection_gate.check(source_text, translation, source_lang, target_lang)
+        if not reasons:
+            return translation
         try:
-            # 使用加权检测算法
-            lang_score = self._detect_language_with_confidence(text)
-            target_code = self.lang_code_map[target_lang]
-            
-            # 判断条件：置信度>60% 或 包含目标语言特征字符
-            if lang_score[target_code] > 0.6:
-                return True
-                
-            # 中日文特有字符检查
-            if target_code == 'zh' and self._contains_chinese_char(text):
-                return True
-            if target_code == 'ja' and self._contains_japanese_char(text):
-                return True
-                
-            return False
+            feedback = self.reflect_translation(source_text, translation, reasons, source_lang, target_lang)
+            return self.improve_translation(source_text, translation, feedback, source_lang, target_lang) or translation
         except Exception as e:
-            logging.error(f"语言检测异常: {str(e)}")
-            return False
+            logging.warning(f"反思改进失败，使用初译结果: {e}")
+            return translation
 
-    def _detect_language_with_confidence(self, text):
-        """带置信度的语言检测（示例实现）"""
-        # 这里可以集成更专业的语言检测服务
-        from langdetect import detect_langs
+    async def _areflect_batch(self, items, source_lang, target_lang):
+        """
+        批量反思改进：一次请求给出所有片段的反馈，再一次请求给出改进译文。
+        :param items: [(原文, 初译, 门控问题列表)]
+        :return: 与 items 对应的改进译文列表，失败的片段为 None
+        """
+        segments = {
+            str(i): {'source': text, 'translation': translation, 'issues': reasons}
+            for i, (text, translation, reasons) in enumerate(items, 1)
+        }
+        feedbacks = {}
+        if len(items) > 1:
+            feedbacks = await self._ainvoke_json(self.prompts.get(REFLECT_BATCH, source_lang, target_lang), segments)
+        for seg_id, segment in segments.items():
+            feedback = feedbacks.get(seg_id)
+            if not isinstance(feedback, str) or not feedback.strip():
+                # 批量反馈缺失，逐段反思
+                try:
+                    feedback = await self.prompts.get(REFLECT, source_lang, target_lang).ainvoke(segment | {'issues': "; ".join(segment['issues'])})
+                except Exception as e:
+                    logging.warning(f"反思失败: {e}")
+                    feedback = "; ".join(segment['issues'])
+            segment['feedback'] = self._clean_feedback(feedback)
+
+        improved = {}
+        if len(items) > 1:
+            improved = await self._ainvoke_json(
+                self.prompts.get(IMPROVE_BATCH, source_lang, target_lang),
+                {seg_id: {k: segment[k] for k in ('source', 'translation', 'feedback')} for seg_id, segment in segments.items()}
+            )
+        results = []
+        for seg_id, segment in segments.items():
+            result = improved.get(seg_id)
+            if not isinstance(result, str) or not result.strip():
+                # 批量改进结果缺失，逐段改进
+                try:
+                    result = await self.prompts.get(IMPROVE, source_lang, target_lang).ainvoke(
+                        {k: segment[k] for k in ('source', 'translation', 'feedback')}
+                    )
+                except Exception as e:
+                    logging.warning(f"改进失败，使用初译结果: {e}")
+                    result = None
+            results.append(result)
+        return results
+
+    async def _ainvoke_json(self, chain, segments):
+        """发送 JSON 批量请求并解析回复，失败时返回空字典"""
         try:
-            results = detect_langs(text)
-            return {lang.lang: lang.prob for lang in results}
-        except:
-            return {'unknown': 0.0}
-
-    def _contains_chinese_char(self, text):
-        """检查是否包含中文字符"""
-        return re.search(r'[\u4e00-\u9fff]', text)
-
-    def _contains_japanese_char(self, text):
-        """检查是否包含日文字符"""
-        return re.search(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF]', text)
-
-    def _is_translatable(self, text):
-        """检查是否需要进入翻译流程"""
-        if len(text.strip()) <= 1 and not text.isdigit():
-            return False
-        return True
-
-    def _is_technical_content(self, text):
-        """检测是否是纯技术内容（缩写/符号）"""
-        stripped_text = text.strip()
-        
-        # 匹配行业缩写（全大写或标准缩写形式）
-        if stripped_text.upper() in self.acronym_manager.industry_abbreviations:
-            return True
-        
-        # 新增强条件：如果包含小写字母则直接返回False
-        if any(c.islower() for c in stripped_text):
-            return False
-            
-        # 匹配技术格式（仅允许大写字母、数字、技术符号）
-        pattern = rf'^[{self.acronym_manager.alphanumeric_chars}{self.acronym_manager.special_characters}]*$'
-        return re.match(pattern, stripped_text, re.ASCII) is not None
+            reply = await chain.ainvoke({"input": json.dumps(segments, ensure_ascii=False)})
+            return self._parse_batch_reply(reply)
+        except Exception as e:
+            logging.warning(f"批量请求失败，改为逐段处理: {e}")
+            return {}
+
+    def _pack_batches(self, items):
+        """按字符预算和片段数上限把待翻译片段分组（超长片段单独成组）"""
+        batch = []
+        batch_chars = 0
+        for item in items:
+            text_len = len(item[1])
+            if batch and (batch_chars + text_len > BATCH_MAX_CHARS or len(batch) >= BATCH_MAX_SEGMENTS):
+                yield batch
+                batch = []
+                batch_chars = 0
+            batch.append(item)
+            batch_chars += text_len
+        if batch:
+            yield batch
+
+    async def _atranslate_packed(self, texts, source_lang, target_lang):
+        """
+        一次请求翻译多个片段。
+        :return: 与 texts 对应的初译列表，解析失败或缺失的片段为 None
+        """
+        if len(texts) == 1:
+            return [None]  # 单个片段直接走逐段翻译，省去 JSON 包装
+        segments = {str(i): text for i, text in enumerate(texts, 1)}
+        try:
+            reply = await self.abatch_translation_with_lang(segments, source_lang, target_lang)
+            parsed = self._parse_batch_reply(reply)
+        except Exception as e:
+            logging.warning(f"批量翻译失败，改为逐段翻译: {e}")
+            return [None] * len(texts)
+        results = []
+        for seg_id in segments:
+            value = parsed.get(seg_id)
+            results.append(value if isinstance(value, str) and value.strip() else None)
+        missing = results.count(None)
+        if missing:
+            logging.warning(f"批量翻译结果缺少 {missing}/{len(texts)} 个片段，缺失部分逐段翻译")
+        return results
+
+    def _parse_batch_reply(self, reply):
+        """解析批量翻译的 JSON 回复（容忍 ```json 代码块和前后多余文字）"""
+        start = reply.find("{")
+        end = reply.rfind("}")
+        if start == -1 or end <= start:
+            raise ValueError(f"批量翻译回复不是 JSON: {reply[:200]}")
+        parsed = json.loads(reply[start:end + 1])
+        if not isinstance(parsed, dict):
+            raise ValueError("批量翻译回复不是 JSON 对象")
+        return parsed
+
+    def _cache_key(self, text, source_lang, target_lang, use_reflection=USE_REFLECTION):
+        """生成缓存键（反思流程的结果与普通翻译分开缓存）"""
+        prompt_version = f"{PROMPT_TEMPLATE_VERSION}+reflection" if use_reflection else PROMPT_TEMPLATE_VERSION
+        return TranslationCache.make_key(text, source_lang, target_lang, self.model_name, self.temperature, prompt_version)
+
+    def cache_stats(self):
+        """返回翻译缓存命中统计"""
+        return self.cache.stats() if self.cache is not None else {}
+    
+    def _log_translation_feedback(self, original_text, translated_text, source_lang, target_lang, status):
+        """翻译前后内容记录到翻译反馈日志（缓冲写入 SQLite）"""
+        get_feedback_store().record(original_text, translated_text, source_lang, target_lang, self.job_id, status)
+
+    def _pre_translation_checks(self, text, target_lang, source_lang=None, label=None):
+        """
+        执行所有前置检查的集成方法
+        :param label: 已由 pre_filter.classify_batch 批量计算好的分类结果（可选）
+        :return: 无需翻译时返回原文，否则返回 None
+        """
+        if label is None:
+            label = self.pre_filter.classify(text, target_lang, source_lang)
+        if label == NEEDS_TRANSLATION:
+            return None
+        if label == TARGET_LANGUAGE:
+            logging.info(f"目标语言内容保留: {text}")
+        elif label == TECHNICAL:
+            logging.debug(f"技术内容保留: {text}")
+        return text
 
     def initial_translation_with_lang(self, processed_text, source_lang, target_lang):
         """初步翻译方法"""
-        system_prompt = (
-            f"You are a automotive software localization expert. "
-            f"Translate from {source_lang} to {target_lang} preserving: "
-            "1. Original formatting and punctuation\n"
-            "2. Industry terms (ECU, ABS, CAN, etc.)\n"
-            "3. Mixed language context\n\n"
-            "Output ONLY the translated text."
-        )
+        return self.prompts.get(INITIAL, source_lang, target_lang).invoke({"input": processed_text})
 
-        user_prompts = {
-            "Chinese": "翻译到中文，保留英文术语：\n{input}",
-            "Japanese": "日本語に翻訳（アルファベット略語はそのまま）：\n{input}",
-            "English": "Translate to English preserving technical terms:\n{input}"
-        }
-        user_prompt = user_prompts.get(target_lang, "Translate:\n{input}")
+    async def ainitial_translation_with_lang(self, processed_text, source_lang, target_lang):
+        """初步翻译方法（异步）"""
+        return await self.prompts.get(INITIAL, source_lang, target_lang).ainvoke({"input": processed_text})
 
-        prompt_template = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("user", user_prompt)
-        ])
+    async def abatch_translation_with_lang(self, segments, source_lang, target_lang):
+        """多段批量翻译请求（异步），输入输出均为 {编号: 文本} 的 JSON 对象"""
+        chain = self.prompts.get(BATCH, source_lang, target_lang)
+        return await chain.ainvoke({"input": json.dumps(segments, ensure_ascii=False)})
 
-        chain = prompt_template | self.llm | StrOutputParser()
-        return chain.invoke({"input": processed_text})
-
-    def reflect_translation(self, translation, target_lang):
+    def reflect_translation(self, source_text, translation, issues, source_lang, target_lang):
         """翻译质量反馈"""
-        system_prompt = {
-            "Chinese": "您是中国汽车行业的本地化专家，请用中文指出以下翻译问题：",
-            "Japanese": "自動車ソフトウェアの専門家として日本語でフィードバック：",
-            "English": "As automotive localization expert, provide English feedback:"
-        }[target_lang]
-
-        user_prompt = (
-            "请检查：\n"
-            "1. 术语一致性（ECU/ABS等是否保留）\n"
-            "2. 混合语言处理\n"
-            "3. 标点格式\n"
-            "4. 技术准确性\n\n"
-            "翻译内容：\n{translation}"
+        feedback = self.prompts.get(REFLECT, source_lang, target_lang).invoke(
+            {"source": source_text, "translation": translation, "issues": "; ".join(issues)}
         )
+        return self._clean_feedback(feedback)
 
-        prompt_template = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("user", user_prompt)
-        ])
-        
-        return prompt_template | self.llm | StrOutputParser() | self._clean_feedback
-
-    def improve_translation(self, translation, feedback, target_lang):
+    def improve_translation(self, source_text, translation, feedback, source_lang, target_lang):
         """迭代改进翻译"""
-        system_prompt = {
-            "Chinese": "您是中国汽车行业的资深译员，请根据反馈改进翻译：",
-            "Japanese": "自動車分野のプロ翻訳者として改善してください：",
-            "English": "Refine this automotive translation per feedback:"
-        }[target_lang]
-
-        user_prompt = (
-            "反馈：\n{feedback}\n\n"
-            "改进要求：\n"
-            "1. 严格保留技术术语\n"
-            "2. 维持标点格式\n"
-            "3. 准确处理混合内容\n\n"
-            "待改进文本：\n{translation}"
+        return self.prompts.get(IMPROVE, source_lang, target_lang).invoke(
+            {"source": source_text, "translation": translation, "feedback": feedback}
         )
 
-        prompt_template = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("user", user_prompt)
-        ])
-
-        chain = prompt_template | self.llm | StrOutputParser()
-        return chain.invoke({"feedback": feedback, "translation": translation})
-
     def _clean_feedback(self, text):
         """清理反馈中的冗余内容"""
         return text.split("改进建议：")[-1].split("---")[0].strip()  
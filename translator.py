@@ -8,31 +8,37 @@ from gl_config import LOG_LEVEL
 logging.basicConfig(level=LOG_LEVEL)
 
 class Translator:
-    def __init__(self):
-        self.translation_core = TranslationCore()
+    def __init__(self, translation_core=None):
+        self.translation_core = translation_core if translation_core is not None else TranslationCore()
     def translate_file(self, file_path, output_path, source_lang, target_lang, task):
         logging.info(f"Starting translation of file: {file_path}")
-        if file_path.endswith('.xlsx') or file_path.endswith('.xls'):
-            translate_excel(self.translation_core, file_path, output_path, source_lang, target_lang, task)
-            if task is not None:
-                task.update_state(state='SUCCESS', meta={'translated_file_path': output_path})
-        elif file_path.endswith('.pptx') or file_path.endswith('.ppt'):
-            translate_powerpoint(self.translation_core, file_path, output_path, source_lang, target_lang, task)
-            if task is not None:
-                task.update_state(state='SUCCESS', meta={'translated_file_path': output_path})
-        elif file_path.endswith('.docx'):
-            translate_word(self.translation_core, file_path, output_path, source_lang, target_lang, task)
-            if task is not None:
-                task.update_state(state='SUCCESS', meta={'translated_file_path': output_path})
-        # elif file_path.endswith('.pdf'):
-            # translate_pdf(self.translation_core, file_path, output_path, source_lang, target_lang, task)
-            # if task is not None:
-            #     task.update_state(state='SUCCESS', meta={'translated_file_path': output_path})
-        else:
-            if task is not None:
-                task.update_state(state='FAILURE', meta={'error': "Unsupported file type"})
-            raise ValueError(f"Unsupported file type: {file_path}")
+        # 任务 ID 只在本次文件翻译期间有效，结束后清除，避免同一 worker 之后的文本翻译沿用
+        self.translation_core.job_id = task.request.id if task is not None else None
+        try:
+            if file_path.endswith('.xlsx') or file_path.endswith('.xls'):
+                translate_excel(self.translation_core, file_path, output_path, source_lang, target_lang, task)
+                if task is not None:
+                    task.update_state(state='SUCCESS', meta={'translated_file_path': output_path})
+            elif file_path.endswith('.pptx') or file_path.endswith('.ppt'):
+                translate_powerpoint(self.translation_core, file_path, output_path, source_lang, target_lang, task)
+                if task is not None:
+                    task.update_state(state='SUCCESS', meta={'translated_file_path': output_path})
+            elif file_path.endswith('.docx'):
+                translate_word(self.translation_core, file_path, output_path, source_lang, target_lang, task)
+                if task is not None:
+                    task.update_state(state='SUCCESS', meta={'translated_file_path': output_path})
+            # elif file_path.endswith('.pdf'):
+                # translate_pdf(self.translation_core, file_path, output_path, source_lang, target_lang, task)
+                # if task is not None:
+                #     task.update_state(state='SUCCESS', meta={'translated_file_path': output_path})
+            else:
+                if task is not None:
+                    task.update_state(state='FAILURE', meta={'error': "Unsupported file type"})
+                raise ValueError(f"Unsupported file type: {file_path}")
+        finally:
+            self.translation_core.job_id = None
         logging.info(f"Completed translation of file: {file_path}")
+        logging.info(f"Translation cache stats: {self.translation_core.cache_stats()}")
     
     def translate_text(self, text, source_lang, target_lang, task):
         translatetext=self.translation_core.translate_text(text, source_lang, target_lang)
@@ -42,4 +48,5 @@ class Translator:
             meta={
                 'translate_result': translatetext
             }
-        )
\ No newline at end of file
+        )
+        return translatetext
\ No newline at end of file
@@ -1,13 +1,19 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
-from task_manager import translate_file, translate_texts, app as celery
+from flask import Flask, request, jsonify, render_template, send_from_directory, Response, stream_with_context
+from task_manager import translate_file, translate_texts, stream_texts, get_queue_wait_stats, app as celery
 import os
+import json
+import queue
 from datetime import datetime
 from celery import Celery
 import logging
 import time
 from file_parsers import get_file_pages, get_file_size
 from celery.result import AsyncResult
-from gl_config import REDIS_DB, REDIS_HOST, REDIS_PORT, MIME_TO_EXTENSION, LOG_LEVEL, VERSION
+from gl_config import REDIS_DB, REDIS_HOST, REDIS_PORT, MIME_TO_EXTENSION, LOG_LEVEL, VERSION, FEEDBACK_PAGE_SIZE
+from gl_config import TASK_EVENTS_KEEPALIVE
+from feedback_store import get_feedback_store
+from checkpoint_store import get_checkpoint_store, JOB_FAILED
+from task_events import get_event_hub, TERMINAL_STATES
 
 # 配置日志记录
 logging.basicConfig(level=LOG_LEVEL)
@@ -133,42 +139,54 @@ def translate():
         logging.error(f"Error starting translation: {e}")
         return jsonify({"error": str(e)}), 500
 
+def _format_task_state(state, meta):
+    """把任务状态和元数据整理为前端使用的进度结构（/task_status 和 /task_events 共用）"""
+    # 基础响应结构
+    response = {
+        'state': state,
+        'progress': 0.0,
+        'current': 0,
+        'total': 1,
+        'translated_file_path': None,
+        'error': None
+    }
+
+    if state == 'PROGRESS':
+        response.update({
+            'progress': float(f"{meta.get('progress', 0.0):.1f}"),  # 格式化为小数点后1位
+            'current': meta.get('current', 0),
+            'total': meta.get('total', 1)
+        })
+    elif state == 'SUCCESS':
+        # 处理成功完成的任务
+        response.update({
+            'progress': 100.0,
+            'current': meta.get('current', 1),
+            'total': meta.get('total', 1),
+            'translated_file_path': meta.get('translated_file_path'),
+            'recovered_segments': meta.get('recovered_segments', 0)
+        })
+    elif state == 'FAILURE':
+        # 处理失败任务
+        response.update({
+            'error': meta.get('error'),
+            'progress': 100.0  # 标记为完全结束
+        })
+    return response
+
+def _query_task_state(task_id):
+    """从 Celery 结果后端读取任务状态"""
+    task = AsyncResult(task_id, app=celery)
+    if task.state == 'FAILURE':
+        meta = {'error': str(task.result)}
+    else:
+        meta = task.info if isinstance(task.info, dict) else {}
+    return _format_task_state(task.state, meta)
+
 @app.route('/task_status/<task_id>', methods=['GET'])
 def task_status(task_id):
     try:
-        task = AsyncResult(task_id, app=celery)
-        # 基础响应结构
-        response = {
-            'state': task.state,
-            'progress': 0.0,
-            'current': 0,
-            'total': 1,
-            'translated_file_path': None,
-            'error': None
-        }
-
-        if task.state == 'PROGRESS':
-            meta = task.info
-            response.update({
-                'progress': float(f"{meta.get('progress', 0.0):.1f}"),  # 格式化为小数点后1位
-                'current': meta.get('current', 0),
-                'total': meta.get('total', 1)
-            })
-        elif task.state == 'SUCCESS':
-            # 处理成功完成的任务
-            meta = task.info
-            response.update({
-                'progress': 100.0,
-                'current': meta.get('current', 1),
-                'total': meta.get('total', 1),
-                'translated_file_path': meta.get('translated_file_path')
-            })
-        elif task.state == 'FAILURE':
-            # 处理失败任务
-            response.update({
-                'error': str(task.result),
-                'progress': 100.0  # 标记为完全结束
-            })
+        response = _query_task_state(task_id)
         print(response)
         return jsonify(response)
     
@@ -176,6 +194,86 @@ def task_status(task_id):
         logging.error(f"查询任务状态失败: {str(e)}")
         return jsonify({'error': '内部服务器错误'}), 500
 
+# 任务进度推送接口（Server-Sent Events）
+@app.route('/task_events/<task_id>', methods=['GET'])
+def task_events(task_id):
+    """
+    推送任务进度：worker 发布的事件由进程内唯一的订阅线程分发到各连接，
+    只有在事件中心还没有该任务的事件时才读取一次结果后端作为初始状态
+    """
+    hub = get_event_hub()
+    subscriber = hub.subscribe(task_id)
+
+    def generate():
+        try:
+            event = hub.last_event(task_id)
+            if event is not None:
+                response = _format_task_state(event['state'], event)
+            else:
+                response = _query_task_state(task_id)
+            yield _sse_event(response)
+            while response['state'] not in TERMINAL_STATES:
+                try:
+                    event = subscriber.get(timeout=TASK_EVENTS_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                response = _format_task_state(event['state'], event)
+                yield _sse_event(response)
+        finally:
+            hub.unsubscribe(task_id, subscriber)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/resume/<task_id>', methods=['POST'])
+def resume_task(task_id):
+    """
+    以原任务 ID 重新提交中断或失败的文件翻译任务，
+    已保存检查点的片段不再翻译，前端可继续按原 task_id 查询进度。
+    只允许恢复失败的任务，或检查点租约已过期（执行它的 worker 已退出）的任务；
+    认领在检查点库中原子完成，避免同一任务 ID 并发执行两次
+    """
+    store = get_checkpoint_store()
+    job = store.get_job(task_id)
+    if job is None:
+        return jsonify({'error': 'Task not found'}), 404
+    if not store.claim_for_resume(task_id):
+        return jsonify({
+            'error': 'Task cannot be resumed',
+            'job_status': job['status'],
+            'lease_expires_at': job['lease_expires_at']
+        }), 409
+    task = AsyncResult(task_id, app=celery)
+    try:
+        # 清除中断前留下的进度或失败状态
+        task.forget()
+        get_event_hub().clear(task_id)
+        translate_file.apply_async(
+            args=(job['file_path'], job['output_path'], job['source_lang'], job['target_lang']),
+            task_id=task_id
+        )
+        logging.info(f"Resumed task {task_id} with {job['checkpointed']} checkpointed segments")
+        return jsonify({
+            'task_id': task_id,
+            'status': 'Translation resumed',
+            'checkpointed_segments': job['checkpointed']
+        })
+    except Exception as e:
+        logging.error(f"Error resuming translation: {e}")
+        # 提交失败时放回失败状态，允许再次恢复
+        store.set_status(task_id, JOB_FAILED)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/queue_stats', methods=['GET'])
+def queue_stats():
+    """各队列任务排队耗时（p50/p99，毫秒），用于确认文件任务负载下文本请求的延迟"""
+    try:
+        return jsonify(get_queue_wait_stats())
+    except Exception as e:
+        logging.error(f"查询队列统计失败: {str(e)}")
+        return jsonify({'error': '内部服务器错误'}), 500
+
 @app.route('/download', methods=['GET'])
 def download():
     file_path = request.args.get('file_path')
@@ -216,6 +314,67 @@ def translate_text():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+def _sse_event(data, event=None):
+    """格式化一条 SSE 消息"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# 流式文字翻译接口：提交文本队列任务，返回 task_id
+@app.route('/translate_text_stream', methods=['POST'])
+def translate_text_stream():
+    data = request.get_json()
+    source_text = data.get('text')
+    source_lang = data.get('source_lang')
+    target_lang = data.get('target_lang')
+    if not source_text or not source_lang or not target_lang:
+        return jsonify({"error": "Missing required parameters"}), 400
+    try:
+        get_event_hub()  # 提交前启动订阅线程，事件中心能缓存任务的全部事件
+        task = stream_texts.apply_async(args=(source_text, source_lang, target_lang))
+        return jsonify({"task_id": task.id}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 流式翻译推送接口（Server-Sent Events），转发 worker 逐 token 发布的事件
+@app.route('/translate_text_stream/<task_id>', methods=['GET'])
+def translate_text_stream_events(task_id):
+    """
+    只转发 stream_texts 任务在 task_events 频道发布的事件，本进程不调用模型。
+    事件中心还没有该任务的事件时（如 Web 进程重启），读取一次结果后端判断任务是否已结束
+    """
+    hub = get_event_hub()
+    subscriber = hub.subscribe(task_id)
+
+    def generate():
+        try:
+            event = hub.last_event(task_id)
+            if event is None:
+                task = AsyncResult(task_id, app=celery)
+                if task.state == 'SUCCESS':
+                    event = dict(task.info, state=task.state)
+                elif task.state == 'FAILURE':
+                    event = {'state': task.state, 'error': str(task.result)}
+            while True:
+                if event is not None:
+                    if event['state'] == 'STREAMING':
+                        yield _sse_event({'token': event['token'], 'text': event['text']})
+                    elif event['state'] == 'SUCCESS':
+                        yield _sse_event({'result': event.get('translate_result')}, event='done')
+                        return
+                    elif event['state'] == 'FAILURE':
+                        yield _sse_event({'error': event.get('error')}, event='error')
+                        return
+                try:
+                    event = subscriber.get(timeout=TASK_EVENTS_KEEPALIVE)
+                except queue.Empty:
+                    event = None
+                    yield ": keepalive\n\n"
+        finally:
+            hub.unsubscribe(task_id, subscriber)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # 获取翻译结果的接口
 @app.route('/translation_text/<task_id>', methods=['GET'])
 def translation_text(task_id):
@@ -251,15 +410,22 @@ def translation_text(task_id):
 
 @app.route('/feedback', methods=['GET'])
 def show_feedback():
-    import pandas as pd
     try:
-        # 读取logfiles目录下的translation_feedback.csv文件
-        feedback_df = pd.read_csv('logfiles/translation_feedback.csv')
-        # 将DataFrame转换为HTML表格
-        feedback_html = feedback_df.to_html(index=False)
-        return render_template('feedback.html', feedback_table=feedback_html)
+        # 分页并按日期/语言/任务过滤，只读取当前页
+        page = max(1, request.args.get('page', 1, type=int))
+        per_page = min(1000, max(1, request.args.get('per_page', FEEDBACK_PAGE_SIZE, type=int)))
+        filters = {
+            'date_from': request.args.get('date_from') or None,
+            'date_to': request.args.get('date_to') or None,
+            'lang': request.args.get('lang') or None,
+            'job_id': request.args.get('job_id') or None
+        }
+        rows, total = get_feedback_store().query(page=page, per_page=per_page, **filters)
+        total_pages = max(1, (total + per_page - 1) // per_page)
+        return render_template('feedback.html', rows=rows, total=total, page=page, per_page=per_page,
+                               total_pages=total_pages, filters=filters)
     except Exception as e:
-        logging.error(f"Error reading feedback file: {e}")
+        logging.error(f"Error reading feedback log: {e}")
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
@@ -4,228 +4,151 @@ from docx.table import Table
 from docx.text.paragraph import Paragraph
 from docx.shared import Pt
 from pptx.dml.color import RGBColor
+from gl_config import WORD_TRANSLATION_MODE, WORD_STREAMING_THRESHOLD_BYTES
+from progress_reporter import ProgressReporter
+from docx_stream_translator import translate_word_streaming
+from ppt_translator import split_text, split_text_into_parts, translate_paragraph_text
 
-def update_progress(task, current_work, total_work):
-    """更新翻译进度"""
-    if task is not None:
-        progress = (current_work / total_work) * 100 if total_work > 0 else 0
-        task.update_state(
-            state='PROGRESS',
-            meta={
-                'current': current_work,
-                'total': total_work,
-                'progress': round(progress, 1)
-            }
-        )
-
-def translate_paragraphs(translation_core, paragraphs, source_lang, target_lang, task, current_work, total_work):
+def collect_paragraphs(paragraphs, collected):
     """
-    逐段落、逐 Run 翻译，并更新 current_work。
-    :param paragraphs: doc.paragraphs 或 cell.paragraphs 或 shape.text_frame.paragraphs
-    :return: 更新后的 current_work
+    收集段落（同一段落只收集一次，合并单元格会重复出现）。
+    :param paragraphs: doc.paragraphs 或 cell.paragraphs 或 header.paragraphs
+    :param collected: 收集结果字典 {段落元素: 段落}（原地追加）
     """
     for para in paragraphs:
-        for run in para.runs:
-            text = run.text
-            if text.strip():
-                translated_text = translation_core.translate_text(text, source_lang, target_lang)
-                run.text = translated_text
-                current_work += len(text)
-                update_progress(task, current_work, total_work)
-    return current_work
-
-def extract_table_text(translation_core, table, source_lang, target_lang, task, current_work, total_work, level=0):
+        collected.setdefault(para._p, para)
+
+def collect_table_paragraphs(table, collected, level=0):
     """
-    递归提取表格中的文本，包括嵌套表格。
-    采用逐段落、逐 Run 的方式翻译，以保留格式并确保不遗漏。
+    递归收集表格中的段落，包括嵌套表格。
     :param table: Word 文档中的表格对象
     :param level: 嵌套层级（用于调试或打印）
-    :return: 更新后的 current_work
     """
     for row in table.rows:
         for cell in row.cells:
-            # 翻译单元格中的所有段落
-            current_work = translate_paragraphs(
-                translation_core, 
-                cell.paragraphs, 
-                source_lang, 
-                target_lang, 
-                task, 
-                current_work, 
-                total_work
-            )
-            # 添加调试信息
-            print(f"翻译单元格内容: {cell.text}，当前进度: {current_work}/{total_work}")
+            # 收集单元格中的所有段落
+            collect_paragraphs(cell.paragraphs, collected)
             # 检查单元格是否包含嵌套表格
             if cell.tables:
                 for nested_table in cell.tables:
-                    current_work = extract_table_text(
-                        translation_core, 
-                        nested_table, 
-                        source_lang, 
-                        target_lang, 
-                        task, 
-                        current_work, 
-                        total_work, 
-                        level + 1
-                    )
-    return current_work
-
-def calculate_total_work(doc):
-    """计算文档总工作量（包括页眉、页脚、正文）"""
-    total_work = 0
-
-    # 处理正文内容
-    for para in doc.paragraphs:
-        total_work += len(para.text)
+                    collect_table_paragraphs(nested_table, collected, level + 1)
+
+# 每节可能有的页眉页脚：默认、首页、偶数页
+HEADER_FOOTER_ATTRS = ('header', 'footer', 'first_page_header', 'first_page_footer',
+                       'even_page_header', 'even_page_footer')
+
+def collect_header_footer_parts(doc):
+    """
+    收集文档中实际存在的页眉页脚，按底层部件去重。
+    链接到前一节（is_linked_to_previous）的页眉页脚没有自己的定义，共用前一节的部件，直接跳过；
+    不访问未定义的页眉页脚，避免 python-docx 为其创建新的空部件。
+    """
+    header_footers = {}
+    for section in doc.sections:
+        for attr in HEADER_FOOTER_ATTRS:
+            header_footer = getattr(section, attr)
+            if not header_footer.is_linked_to_previous:
+                header_footers.setdefault(header_footer.part, header_footer)
+    return list(header_footers.values())
+
+def collect_document_paragraphs(doc):
+    """收集文档中所有段落（正文、表格、内联形状、页眉、页脚）"""
+    collected = {}
+
+    # 1. 正文内容
+    # 1.1 段落
+    collect_paragraphs(doc.paragraphs, collected)
+
+    # 1.2 正文中的表格
     for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                total_work += len(cell.text)
-                # 检查单元格是否包含嵌套表格
-                if cell.tables:
-                    for nested_table in cell.tables:
-                        for nested_row in nested_table.rows:
-                            for nested_cell in nested_row.cells:
-                                total_work += len(nested_cell.text)
-
-    # 处理内联形状的文本
+        collect_table_paragraphs(table, collected)
+
+    # 1.3 内联形状
     for shape in doc.inline_shapes:
-        if hasattr(shape, 'text_frame'):
-            text_frame = shape.text_frame
-            for para in text_frame.paragraphs:
-                total_work += len(para.text)
+        if not hasattr(shape, 'text_frame'):
+            continue
+        collect_paragraphs(shape.text_frame.paragraphs, collected)
 
-    # 处理页眉和页脚
-    for section in doc.sections:
-        # 页眉
-        header = section.header
-        for para in header.paragraphs:
-            total_work += len(para.text)
-        for table in header.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    total_work += len(cell.text)
-                    # 检查单元格是否包含嵌套表格
-                    if cell.tables:
-                        for nested_table in cell.tables:
-                            for nested_row in nested_table.rows:
-                                for nested_cell in nested_row.cells:
-                                    total_work += len(nested_cell.text)
-        # 页脚
-        footer = section.footer
-        for para in footer.paragraphs:
-            total_work += len(para.text)
-        for table in footer.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    total_work += len(cell.text)
-                    # 检查单元格是否包含嵌套表格
-                    if cell.tables:
-                        for nested_table in cell.tables:
-                            for nested_row in nested_table.rows:
-                                for nested_cell in nested_row.cells:
-                                    total_work += len(nested_cell.text)
-    return total_work
+    # 2. 页眉页脚（含首页、偶数页），每个部件只收集一次
+    for header_footer in collect_header_footer_parts(doc):
+        collect_paragraphs(header_footer.paragraphs, collected)
+        for table in header_footer.tables:
+            collect_table_paragraphs(table, collected)
+    return list(collected.values())
+
+def collect_runs(paragraphs):
+    """run 模式：收集所有需要翻译的 Run"""
+    return [run for para in paragraphs for run in para.runs if run.text.strip()]
+
+def collect_paragraph_units(paragraphs):
+    """
+    段落模式：每个段落合并全部 run 的文本作为一个翻译单元
+    :return: [(有文本的 run 列表, 合并文本)]
+    """
+    units = []
+    for para in paragraphs:
+        text_runs = [run for run in para.runs if run.text]
+        combined_text = "".join(run.text for run in text_runs)
+        if combined_text.strip():
+            units.append((text_runs, combined_text))
+    return units
+
+def apply_paragraph_unit(text_runs, combined_text, translations, target_lang):
+    """把段落译文按原 run 数量拆分写回，保持每个 run 的格式"""
+    translated_text = translate_paragraph_text(combined_text, translations)
+    if translated_text == combined_text:
+        return
+    if len(text_runs) == 1:
+        text_runs[0].text = translated_text
+        return
+    for run, part in zip(text_runs, split_text_into_parts(translated_text, len(text_runs), target_lang)):
+        run.text = part
 
 def translate_word(translation_core, file_path, output_path, source_lang, target_lang, task):
     """
     翻译 Word 文档的全部内容（正文、页眉、页脚）
+    WORD_TRANSLATION_MODE 为 'paragraph' 时整段翻译后按 run 拆分回写，为 'run' 时逐个 run 翻译
     """
+    # 超大文档使用流式引擎，内存占用与单个段落成正比
+    if WORD_STREAMING_THRESHOLD_BYTES and os.path.getsize(file_path) >= WORD_STREAMING_THRESHOLD_BYTES:
+        return translate_word_streaming(translation_core, file_path, output_path, source_lang, target_lang, task)
+
     doc = Document(file_path)
-    
-    # 计算总文本量（包括页眉页脚）
-    total_work = calculate_total_work(doc)
-    current_work = 0
-
-    # 1. 翻译正文内容
-    # 1.1 翻译段落
-    current_work = translate_paragraphs(
-        translation_core, 
-        doc.paragraphs, 
-        source_lang, 
-        target_lang, 
-        task, 
-        current_work, 
-        total_work
-    )
-
-    # 1.2 翻译正文中的表格
-    for table in doc.tables:
-        current_work = extract_table_text(
-            translation_core, 
-            table, 
-            source_lang, 
-            target_lang, 
-            task, 
-            current_work, 
-            total_work
-        )
 
-    # 1.3 翻译内联形状
-    for shape in doc.inline_shapes:
-        if not hasattr(shape, 'text_frame'):
-            continue
-        text_frame = shape.text_frame
-        current_work = translate_paragraphs(
-            translation_core, 
-            text_frame.paragraphs, 
-            source_lang, 
-            target_lang, 
-            task, 
-            current_work, 
-            total_work
-        )
+    # 收集阶段：收集所有段落
+    paragraphs = collect_document_paragraphs(doc)
+    reporter = ProgressReporter(task)
 
-    # 2. 翻译页眉页脚
-    for section in doc.sections:
-        # 2.1 处理页眉
-        header = section.header
-        # 翻译页眉段落
-        current_work = translate_paragraphs(
-            translation_core, 
-            header.paragraphs, 
-            source_lang, 
-            target_lang, 
-            task, 
-            current_work, 
-            total_work
+    if WORD_TRANSLATION_MODE == 'paragraph':
+        units = collect_paragraph_units(paragraphs)
+
+        # 翻译阶段：长段落先分块，再对所有分块去重翻译
+        translations = translation_core.translate_unique(
+            [chunk for _, combined_text in units for chunk in split_text(combined_text)],
+            source_lang,
+            target_lang,
+            progress_callback=reporter
         )
-        # 翻译页眉表格
-        for table in header.tables:
-            current_work = extract_table_text(
-                translation_core, 
-                table, 
-                source_lang, 
-                target_lang, 
-                task, 
-                current_work, 
-                total_work
-            )
-
-        # 2.2 处理页脚
-        footer = section.footer
-        # 翻译页脚段落
-        current_work = translate_paragraphs(
-            translation_core, 
-            footer.paragraphs, 
-            source_lang, 
-            target_lang, 
-            task, 
-            current_work, 
-            total_work
+        reporter.flush()
+
+        # 回写阶段：按原 run 拆分写回
+        for text_runs, combined_text in units:
+            apply_paragraph_unit(text_runs, combined_text, translations, target_lang)
+    else:
+        runs = collect_runs(paragraphs)
+
+        # 翻译阶段：只翻译去重后的文本，进度按唯一文本计算
+        translations = translation_core.translate_unique(
+            [run.text for run in runs],
+            source_lang,
+            target_lang,
+            progress_callback=reporter
         )
-        # 翻译页脚表格
-        for table in footer.tables:
-            current_work = extract_table_text(
-                translation_core, 
-                table, 
-                source_lang, 
-                target_lang, 
-                task, 
-                current_work, 
-                total_work
-            )
+        reporter.flush()
+
+        # 回写阶段：把译文写回所有出现该文本的 Run
+        for run in runs:
+            run.text = translations.get(run.text, run.text)
 
     # 保存文档
-    doc.save(output_path)
\ No newline at end of file
+    doc.save(output_path)
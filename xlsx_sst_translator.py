@@ -0,0 +1,215 @@
+import logging
+import posixpath
+import re
+import zipfile
+from lxml import etree
+from gl_config import LOG_LEVEL, EXCEL_COLUMN_PROFILING
+from ppt_translator import split_text_into_parts
+from progress_reporter import ProgressReporter
+from column_profiler import ColumnProfiler, CellValue
+
+# 配置日志记录
+logging.basicConfig(level=LOG_LEVEL)
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_CONTENT_TYPES = 'http://schemas.openxmlformats.org/package/2006/content-types'
+NS_PACKAGE_RELS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+NS_DOCUMENT_RELS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+SHARED_STRINGS_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml'
+WORKSHEET_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+# 工作簿主部件（xlsx/xlsm/xltx/xltm）
+WORKBOOK_TYPE_SUFFIXES = ('sheet.main+xml', 'sheet.macroEnabled.main+xml',
+                          'template.main+xml', 'template.macroEnabled.main+xml')
+
+_T = f'{{{NS_MAIN}}}t'
+_R = f'{{{NS_MAIN}}}r'
+_C = f'{{{NS_MAIN}}}c'
+_V = f'{{{NS_MAIN}}}v'
+_IS = f'{{{NS_MAIN}}}is'
+_COLUMN_RE = re.compile(r'[A-Z]+')
+
+
+def _parts_by_content_type(zin):
+    """从 [Content_Types].xml 中读取各部件的内容类型"""
+    root = etree.fromstring(zin.read('[Content_Types].xml'))
+    parts = {}
+    for override in root.iter(f'{{{NS_CONTENT_TYPES}}}Override'):
+        parts[override.get('PartName').lstrip('/')] = override.get('ContentType')
+    return parts
+
+def _sheet_names(zin, content_types):
+    """工作表部件名 → 工作表名（读取工作簿部件及其关系文件）"""
+    workbook_part = next((part_name for part_name, content_type in content_types.items()
+                          if content_type.endswith(WORKBOOK_TYPE_SUFFIXES)), None)
+    if workbook_part is None:
+        return {}
+    folder, name = posixpath.split(workbook_part)
+    try:
+        rels = etree.fromstring(zin.read(posixpath.join(folder, '_rels', f'{name}.rels')))
+    except KeyError:
+        return {}
+    targets = {}
+    for rel in rels.iter(f'{{{NS_PACKAGE_RELS}}}Relationship'):
+        target = rel.get('Target', '')
+        targets[rel.get('Id')] = (target.lstrip('/') if target.startswith('/')
+                                  else posixpath.normpath(posixpath.join(folder, target)))
+    names = {}
+    for sheet in etree.fromstring(zin.read(workbook_part)).iter(f'{{{NS_MAIN}}}sheet'):
+        part_name = targets.get(sheet.get(f'{{{NS_DOCUMENT_RELS}}}id'))
+        if part_name:
+            names[part_name] = sheet.get('name')
+    return names
+
+def _iter_cells(zin, part_name, root=None):
+    """遍历工作表的 <c> 元素；未解析的工作表增量解析，处理过的单元格随即释放"""
+    if root is not None:
+        yield from root.iter(_C)
+        return
+    with zin.open(part_name) as source:
+        for _, cell in etree.iterparse(source, tag=_C, huge_tree=True):
+            yield cell
+            cell.clear()
+            while cell.getprevious() is not None:
+                del cell.getparent()[0]
+
+def _profile_string_items(zin, content_types, sheet_parts, documents, shared_items, inline_items):
+    """
+    列画像：按工作表、按列统计单元格引用的字符串，返回需要翻译的字符串项和跳过的单元格数。
+    共享字符串可能被多个单元格引用，只有引用它的单元格全部被跳过时才不翻译；
+    没有被任何单元格引用的共享字符串照常翻译。
+    """
+    sheet_names = _sheet_names(zin, content_types)
+    profiler = ColumnProfiler()
+    shared_texts = {}
+    referenced = set()
+    kept_sources = set()     # 保留的共享字符串序号和内联字符串项
+    skipped_inline = set()
+    skipped_cells = 0
+    for part_name in sheet_parts:
+        entries = []
+        for cell in _iter_cells(zin, part_name, documents.get(part_name)):
+            match = _COLUMN_RE.match(cell.get('r', ''))
+            if match is None:
+                continue
+            if cell.get('t') == 's':
+                value = cell.find(_V)
+                try:
+                    index = int(value.text)
+                except (AttributeError, TypeError, ValueError):
+                    continue
+                if not 0 <= index < len(shared_items):
+                    continue
+                referenced.add(index)
+                if index not in shared_texts:
+                    shared_texts[index] = _item_text(shared_items[index])
+                entries.append(CellValue(match.group(), shared_texts[index], index))
+            elif cell.get('t') == 'inlineStr':
+                item = cell.find(_IS)
+                if item is not None:
+                    entries.append(CellValue(match.group(), _item_text(item), item))
+        entries = [entry for entry in entries if entry.value.strip()]
+        kept, skipped, _ = profiler.profile(sheet_names.get(part_name, part_name), entries)
+        skipped_cells += skipped
+        kept_ids = {id(entry) for entry in kept}
+        kept_sources.update(entry.source for entry in kept)
+        skipped_inline.update(entry.source for entry in entries
+                              if id(entry) not in kept_ids and not isinstance(entry.source, int))
+
+    items = [item for index, item in enumerate(shared_items) if index in kept_sources or index not in referenced]
+    items.extend(item for item in inline_items if item not in skipped_inline)
+    return items, skipped_cells
+
+def _string_item_runs(item):
+    """
+    返回字符串项（sharedStrings 的 <si> 或内联字符串的 <is>）中承载文本的 <t> 元素列表。
+    富文本取各 <r> 下的 <t>，不包含注音 <rPh>。
+    """
+    runs = item.findall(_R)
+    if runs:
+        return [t for r in runs for t in r.findall(_T)]
+    return item.findall(_T)
+
+def _item_text(item):
+    return ''.join(t.text or '' for t in _string_item_runs(item))
+
+def _set_text(t_element, text):
+    t_element.text = text
+    if text != text.strip():
+        t_element.set(XML_SPACE, 'preserve')
+
+def _apply_translation(item, translations, target_lang):
+    """把译文写回字符串项，富文本按原 run 数量拆分"""
+    t_elements = _string_item_runs(item)
+    text = ''.join(t.text or '' for t in t_elements)
+    translated = translations.get(text)
+    if translated is None or translated == text:
+        return False
+    if len(t_elements) == 1:
+        _set_text(t_elements[0], translated)
+    else:
+        for t_element, part in zip(t_elements, split_text_into_parts(translated, len(t_elements), target_lang)):
+            _set_text(t_element, part)
+    return True
+
+def _serialize(root):
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+def translate_xlsx_shared_strings(translation_core, file_path, output_path, source_lang, target_lang, task):
+    """
+    共享字符串级 XLSX 翻译：
+    直接读取 xlsx 压缩包，每个共享字符串（xl/sharedStrings.xml）和内联字符串只翻译一次，
+    其余部件（公式、形状、图表、样式等）原样复制，不经过 openpyxl 重新序列化。
+    """
+    logging.info(f"Starting shared-strings translation of Excel file: {file_path}")
+    with zipfile.ZipFile(file_path) as zin:
+        content_types = _parts_by_content_type(zin)
+
+        # 1. 收集阶段：共享字符串表 + 含内联字符串的工作表
+        documents = {}
+        shared_items = []
+        inline_items = []
+        sheet_parts = []
+        for part_name, content_type in content_types.items():
+            if content_type == SHARED_STRINGS_TYPE:
+                root = etree.fromstring(zin.read(part_name))
+                documents[part_name] = root
+                shared_items.extend(root.iter(f'{{{NS_MAIN}}}si'))
+            elif content_type == WORKSHEET_TYPE:
+                sheet_parts.append(part_name)
+                data = zin.read(part_name)
+                if b'inlineStr' not in data:
+                    continue  # 没有内联字符串的工作表原样复制
+                root = etree.fromstring(data)
+                sheet_inline_items = [cell.find(_IS) for cell in root.iter(_C) if cell.get('t') == 'inlineStr']
+                sheet_inline_items = [item for item in sheet_inline_items if item is not None]
+                if sheet_inline_items:
+                    documents[part_name] = root
+                    inline_items.extend(sheet_inline_items)
+
+        # 列画像：跳过十六进制、信号名、零件号、单位等非语言列中的字符串
+        items = shared_items + inline_items
+        skipped_cells = 0
+        if EXCEL_COLUMN_PROFILING:
+            items, skipped_cells = _profile_string_items(
+                zin, content_types, sheet_parts, documents, shared_items, inline_items
+            )
+
+        # 2. 翻译阶段：只翻译去重后的文本
+        texts = [_item_text(item) for item in items]
+        reporter = ProgressReporter(task)
+        translations = translation_core.translate_unique(
+            texts, source_lang, target_lang, progress_callback=reporter, fallback_on_error=True
+        )
+        reporter.flush()
+
+        # 3. 回写阶段：修改过的部件重新序列化，其他部件原样复制
+        changed = sum(_apply_translation(item, translations, target_lang) for item in items)
+        replaced = {part_name: _serialize(root) for part_name, root in documents.items()}
+        with zipfile.ZipFile(output_path, 'w') as zout:
+            for info in zin.infolist():
+                data = replaced.get(info.filename)
+                zout.writestr(info, data if data is not None else zin.read(info.filename))
+    logging.info(f"Translated {changed}/{len(items)} string items ({len(translations)} unique), "
+                 f"skipped {skipped_cells} cells in passthrough columns. Saved to: {output_path}")